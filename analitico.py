@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Snapshot colunar (Parquet) de contas e transações para os relatórios gerenciais
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from dateutil import tz
+
+from armazenamento import arquivos_do_banco, conectar
+
+DIRETORIO_ANALITICO = 'database/analitico'
+
+# Lançamentos lidos do banco por vez durante a atualização
+TAMANHO_LEITURA = 200000
+
+# Acima deste número de arquivos em um mês a partição é compactada
+ARQUIVOS_POR_MES = 20
+
+# Muda quando o conteúdo exportado muda; um snapshot de outra versão é refeito do zero
+VERSAO_SNAPSHOT = 2
+
+# Schema fixo: evita que um arquivo só com nulos em uma coluna mude o tipo da partição
+SCHEMA_TRANSACOES = pa.schema([
+    ('id', pa.int64()),
+    ('conta_origem', pa.string()),
+    ('conta_destino', pa.string()),
+    ('tipo', pa.string()),
+    ('valor', pa.float64()),
+    ('descricao', pa.string()),
+    ('data', pa.string()),
+    ('criado_em', pa.float64()),
+    ('shard', pa.int64()),
+    ('momento', pa.timestamp('us')),
+])
+
+def _temporario(caminho):
+    """Nome temporário iniciado por '.', que a leitura do dataset ignora"""
+    pasta, nome = os.path.split(caminho)
+    return os.path.join(pasta, f'.{nome}.tmp')
+
+def _gravar_parquet(df, caminho, schema=None):
+    """Grava um Parquet de forma atômica (arquivo temporário + rename)"""
+    temporario = _temporario(caminho)
+    df.to_parquet(temporario, index=False, schema=schema)
+    os.replace(temporario, caminho)
+
+def _ler_estado(diretorio):
+    caminho = os.path.join(diretorio, 'estado.json')
+    if not os.path.exists(caminho):
+        return {'versao': VERSAO_SNAPSHOT, 'ultimos_ids': {}, 'atualizado_em': None}
+    with open(caminho, encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+def _gravar_estado(diretorio, estado):
+    caminho = os.path.join(diretorio, 'estado.json')
+    with open(caminho + '.tmp', 'w', encoding='utf-8') as arquivo:
+        json.dump(estado, arquivo)
+    os.replace(caminho + '.tmp', caminho)
+
+def _momento(df):
+    """Instante de cada lançamento em hora local (como o campo data e os extratos).
+
+    Usa criado_em (epoch) ou, em registros antigos, o campo data.
+    """
+    momento = pd.to_datetime(df['criado_em'], unit='s', utc=True).dt.tz_convert(tz.tzlocal()).dt.tz_localize(None)
+    antigos = momento.isna()
+    if antigos.any():
+        momento[antigos] = pd.to_datetime(df.loc[antigos, 'data'], format='%d/%m/%Y %H:%M:%S', errors='coerce')
+    return momento.dt.floor('us')
+
+def _concluir_compactacao(pasta):
+    """Termina uma compactação interrompida a partir do seu registro (_compactacao.json)"""
+    registro = os.path.join(pasta, '_compactacao.json')
+    if not os.path.exists(registro):
+        return
+    with open(registro, encoding='utf-8') as arquivo:
+        compactacao = json.load(arquivo)
+
+    destino = os.path.join(pasta, compactacao['destino'])
+    if os.path.exists(_temporario(destino)):
+        os.replace(_temporario(destino), destino)
+    for nome in compactacao['remover']:
+        if os.path.exists(os.path.join(pasta, nome)):
+            os.remove(os.path.join(pasta, nome))
+    os.remove(registro)
+
+def _compactar_mes(pasta):
+    """Junta os arquivos de uma partição mensal em um só.
+
+    O arquivo combinado e a lista dos que saem são gravados antes de qualquer
+    remoção, então uma interrupção nunca deixa linhas repetidas ou perdidas
+    depois de _concluir_compactacao.
+    """
+    _concluir_compactacao(pasta)
+    arquivos = sorted(nome for nome in os.listdir(pasta) if nome.endswith('.parquet'))
+    if len(arquivos) <= ARQUIVOS_POR_MES:
+        return
+    df = pd.concat([pd.read_parquet(os.path.join(pasta, nome)) for nome in arquivos], ignore_index=True)
+    destino = os.path.join(pasta, arquivos[0])
+    df.to_parquet(_temporario(destino), index=False, schema=SCHEMA_TRANSACOES)
+    with open(os.path.join(pasta, '_compactacao.json'), 'w', encoding='utf-8') as arquivo:
+        json.dump({'destino': arquivos[0], 'remover': arquivos[1:]}, arquivo)
+    _concluir_compactacao(pasta)
+
+def atualizar_snapshot(total_shards=0, diretorio=DIRETORIO_ANALITICO):
+    """Atualiza o snapshot a partir do banco transacional.
+
+    As contas são regravadas por inteiro (o saldo muda); as transações são
+    incrementais: só os ids acima do último já exportado de cada arquivo são
+    lidos e acrescentados à partição do mês (mes=AAAA-MM, hora local). Cada
+    arquivo novo é nomeado pelo primeiro id que contém, então repetir uma
+    atualização interrompida sobrescreve em vez de duplicar. O crédito de uma
+    transferência entre shards (TRANSFERENCIA_RECEBIDA) é a segunda perna da
+    mesma transação e não é exportado.
+    """
+    estado = _ler_estado(diretorio)
+    pasta_transacoes = os.path.join(diretorio, 'transacoes')
+    if estado.get('versao') != VERSAO_SNAPSHOT:
+        shutil.rmtree(pasta_transacoes, ignore_errors=True)
+        estado = {'versao': VERSAO_SNAPSHOT, 'ultimos_ids': {}, 'atualizado_em': None}
+    os.makedirs(pasta_transacoes, exist_ok=True)
+    for nome in os.listdir(pasta_transacoes):
+        _concluir_compactacao(os.path.join(pasta_transacoes, nome))
+    contas = []
+    novos = 0
+    pastas_alteradas = set()
+
+    for indice, (caminho, _) in enumerate(arquivos_do_banco(total_shards)):
+        conn = conectar(caminho)
+        conn.execute('BEGIN')
+        contas.append(pd.read_sql_query(
+            'SELECT numero, titular, email, cpf, saldo, data_criacao, tipo_conta FROM contas', conn
+        ).assign(shard=indice))
+
+        ultimo_id = estado['ultimos_ids'].get(caminho, 0)
+        while True:
+            df = pd.read_sql_query('''
+                SELECT id, conta_origem, conta_destino, tipo, valor, descricao, data, criado_em
+                FROM transacoes
+                WHERE id > ? AND tipo != 'TRANSFERENCIA_RECEBIDA'
+                ORDER BY id
+                LIMIT ?
+            ''', conn, params=(ultimo_id, TAMANHO_LEITURA))
+            if df.empty:
+                break
+
+            df['shard'] = indice
+            df['momento'] = _momento(df)
+            meses = df['momento'].dt.strftime('%Y-%m').fillna('sem-data')
+            for mes, parte in df.groupby(meses):
+                pasta = os.path.join(diretorio, 'transacoes', f'mes={mes}')
+                os.makedirs(pasta, exist_ok=True)
+                _gravar_parquet(parte[SCHEMA_TRANSACOES.names],
+                                os.path.join(pasta, f'parte-{indice:03d}-{parte["id"].iloc[0]:012d}.parquet'),
+                                SCHEMA_TRANSACOES)
+                pastas_alteradas.add(pasta)
+
+            ultimo_id = int(df['id'].iloc[-1])
+            novos += len(df)
+            estado['ultimos_ids'][caminho] = ultimo_id
+            _gravar_estado(diretorio, estado)
+
+        conn.execute('COMMIT')
+        conn.close()
+
+    _gravar_parquet(pd.concat(contas, ignore_index=True), os.path.join(diretorio, 'contas.parquet'))
+    estado['atualizado_em'] = time.time()
+    _gravar_estado(diretorio, estado)
+
+    # Só depois do estado gravado, para que repetir a atualização não recrie arquivos já compactados
+    for pasta in pastas_alteradas:
+        _compactar_mes(pasta)
+    return novos
+
+class RelatorioAnalitico:
+    """Relatórios gerenciais calculados sobre o snapshot colunar"""
+
+    def __init__(self, diretorio=DIRETORIO_ANALITICO):
+        self.diretorio = diretorio
+
+    def disponivel(self):
+        """Indica se já existe um snapshot gerado"""
+        return os.path.exists(os.path.join(self.diretorio, 'contas.parquet'))
+
+    def defasagem(self):
+        """Segundos desde a última atualização do snapshot (None se nunca atualizado)"""
+        atualizado_em = _ler_estado(self.diretorio)['atualizado_em']
+        if atualizado_em is None:
+            return None
+        return time.time() - atualizado_em
+
+    def contas(self, colunas=None):
+        return pd.read_parquet(os.path.join(self.diretorio, 'contas.parquet'), columns=colunas)
+
+    def _arquivos_transacoes(self, mes):
+        pasta = os.path.join(self.diretorio, 'transacoes', f'mes={mes}')
+        return [os.path.join(pasta, nome) for nome in sorted(os.listdir(pasta)) if nome.endswith('.parquet')]
+
+    def transacoes(self, meses=None, colunas=None):
+        """Lê as transações, opcionalmente só das partições dos meses e das colunas informados"""
+        pasta = os.path.join(self.diretorio, 'transacoes')
+        colunas = colunas or ['id', 'shard', 'conta_origem', 'conta_destino', 'tipo', 'valor',
+                              'descricao', 'data', 'momento']
+        if not self.meses():
+            return pd.DataFrame(columns=colunas)
+        filtros = [('mes', 'in', list(meses))] if meses else None
+        return pd.read_parquet(pasta, columns=colunas, filters=filtros)
+
+    def meses(self):
+        """Meses disponíveis no snapshot (AAAA-MM), do mais recente ao mais antigo"""
+        pasta = os.path.join(self.diretorio, 'transacoes')
+        if not os.path.isdir(pasta):
+            return []
+        return sorted((nome[4:] for nome in os.listdir(pasta) if nome.startswith('mes=')), reverse=True)
+
+    # As três consultas abaixo têm o mesmo formato das de BancoDigital, para que
+    # as telas gerenciais possam usar o snapshot no lugar do banco transacional
+
+    def obter_estatisticas(self):
+        """Total de contas, saldo total e total de transações (contagem pelos metadados do Parquet)"""
+        saldos = self.contas(['saldo'])['saldo']
+        total_transacoes = sum(pq.read_metadata(arquivo).num_rows
+                               for mes in self.meses() for arquivo in self._arquivos_transacoes(mes))
+        return len(saldos), float(saldos.sum()), total_transacoes
+
+    def obter_contas(self):
+        """Contas no formato de BancoDigital.obter_contas"""
+        contas = self.contas().sort_values('data_criacao', ascending=False)
+        colunas = ['numero', 'titular', 'email', 'cpf', 'saldo', 'data_criacao', 'tipo_conta']
+        return list(contas[colunas].itertuples(index=False, name=None))
+
+    def obter_todas_transacoes(self, limite=100):
+        """Últimas transações com o nome dos titulares (visão gerencial).
+
+        Lê só as partições mais recentes, até juntar o limite pedido.
+        """
+        colunas = ['data', 'tipo', 'valor', 'descricao', 'conta_origem', 'conta_destino', 'momento']
+        partes, lidas = [], 0
+        for mes in self.meses():
+            if lidas >= limite:
+                break
+            if mes == 'sem-data':
+                continue
+            for arquivo in self._arquivos_transacoes(mes):
+                partes.append(pd.read_parquet(arquivo, columns=colunas))
+                lidas += len(partes[-1])
+        if not partes:
+            return []
+        df = pd.concat(partes, ignore_index=True).nlargest(limite, 'momento')
+
+        numeros = set(df['conta_origem'].dropna()) | set(df['conta_destino'].dropna())
+        titulares = dict(pd.read_parquet(
+            os.path.join(self.diretorio, 'contas.parquet'), columns=['numero', 'titular'],
+            filters=[('numero', 'in', list(numeros))] if numeros else None
+        ).itertuples(index=False, name=None))
+        return [
+            (data, tipo, valor, descricao, titulares.get(origem), titulares.get(destino))
+            for data, tipo, valor, descricao, origem, destino in df[colunas[:-1]].itertuples(index=False, name=None)
+        ]
+
+    def volume_por_tipo(self, meses=None):
+        """Quantidade e valor das transações por tipo"""
+        df = self.transacoes(meses, ['tipo', 'valor'])
+        return (df.groupby('tipo', observed=True)['valor']
+                .agg(quantidade='count', valor_total='sum')
+                .sort_values('valor_total', ascending=False)
+                .reset_index())
+
+    def top_contas(self, n=10, meses=None):
+        """Contas com maior volume movimentado (entradas + saídas)"""
+        df = self.transacoes(meses, ['conta_origem', 'conta_destino', 'valor'])
+        movimento = pd.concat([
+            df[['conta_origem', 'valor']].rename(columns={'conta_origem': 'numero'}),
+            df[['conta_destino', 'valor']].rename(columns={'conta_destino': 'numero'}),
+        ]).dropna(subset=['numero'])
+        volume = movimento.groupby('numero')['valor'].agg(movimentacoes='count', volume='sum')
+        top = volume.nlargest(n, 'volume').reset_index()
+        return top.merge(self.contas(['numero', 'titular', 'tipo_conta', 'saldo']), on='numero', how='left')
+
+    def fluxo_diario(self, meses=None):
+        """Entradas e saídas externas por dia (transferências internas se anulam)"""
+        df = self.transacoes(meses, ['conta_origem', 'conta_destino', 'valor', 'momento'])
+        dia = df['momento'].dt.normalize()
+        entradas = df['valor'].where(df['conta_origem'].isna(), 0.0)
+        saidas = df['valor'].where(df['conta_destino'].isna(), 0.0)
+        fluxo = pd.DataFrame({'dia': dia, 'entradas': entradas, 'saidas': saidas}).groupby('dia').sum()
+        fluxo['liquido'] = fluxo['entradas'] - fluxo['saidas']
+        return fluxo.reset_index()
+
+def main():
+    """Atualiza o snapshot pela linha de comando (uma vez ou periodicamente)"""
+    parser = argparse.ArgumentParser(description="Snapshot analítico em Parquet")
+    parser.add_argument('--intervalo', type=float, help="Atualiza a cada N segundos")
+    parser.add_argument('--shards', type=int, default=int(os.environ.get('BANKTECH_SHARDS', '0') or 0),
+                        help="Número de shards (modo fragmentado)")
+    args = parser.parse_args()
+
+    while True:
+        inicio = time.perf_counter()
+        novos = atualizar_snapshot(args.shards)
+        print(f"✅ Snapshot atualizado: {novos} novas transações em {time.perf_counter() - inicio:.2f}s")
+        if not args.intervalo:
+            break
+        time.sleep(args.intervalo)
+
+if __name__ == "__main__":
+    main()
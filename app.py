@@ -1,11 +1,14 @@
+import time
+
+_INICIO_SCRIPT = time.perf_counter()
+
 import streamlit as st
-import pandas as pd
 from datetime import datetime
-import sqlite3
-import hashlib
 import os
 from pathlib import Path
 
+from banco import BancoDigital
+
 # Configuração da página
 st.set_page_config(
     page_title="BankTech - Sistema Bancário",
@@ -46,265 +49,22 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-class BancoDigital:
-    def __init__(self):
-        self.init_database()
-    
-    def init_database(self):
-        """Inicializa o banco de dados SQLite"""
-        os.makedirs('database', exist_ok=True)
-        self.conn = sqlite3.connect('database/banco_digital.db', check_same_thread=False)
-        self.cursor = self.conn.cursor()
-        
-        # Tabela de contas
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS contas (
-                numero TEXT PRIMARY KEY,
-                titular TEXT NOT NULL,
-                email TEXT,
-                cpf TEXT UNIQUE,
-                saldo REAL DEFAULT 0.0,
-                data_criacao TEXT,
-                tipo_conta TEXT DEFAULT 'CORRENTE'
-            )
-        ''')
-        
-        # Tabela de transações
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS transacoes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                conta_origem TEXT,
-                conta_destino TEXT,
-                tipo TEXT NOT NULL,
-                valor REAL NOT NULL,
-                descricao TEXT,
-                data TEXT,
-                FOREIGN KEY (conta_origem) REFERENCES contas (numero),
-                FOREIGN KEY (conta_destino) REFERENCES contas (numero)
-            )
-        ''')
-        
-        # Tabela de usuários (funcionários)
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS usuarios (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                senha_hash TEXT NOT NULL,
-                nome TEXT NOT NULL,
-                cargo TEXT DEFAULT 'FUNCIONARIO'
-            )
-        ''')
-        
-        # Inserir usuário admin padrão
-        self.cursor.execute('''
-            INSERT OR IGNORE INTO usuarios (username, senha_hash, nome, cargo)
-            VALUES (?, ?, ?, ?)
-        ''', ('admin', self.hash_password('admin123'), 'Administrador', 'GERENTE'))
-        
-        self.conn.commit()
-    
-    def hash_password(self, password):
-        """Gera hash da senha"""
-        return hashlib.sha256(password.encode()).hexdigest()
-    
-    def verificar_login(self, username, password):
-        """Verifica credenciais de login"""
-        senha_hash = self.hash_password(password)
-        self.cursor.execute(
-            'SELECT * FROM usuarios WHERE username = ? AND senha_hash = ?',
-            (username, senha_hash)
-        )
-        return self.cursor.fetchone()
-    
-    def criar_conta(self, numero, titular, email, cpf, saldo_inicial=0.0, tipo_conta='CORRENTE'):
-        """Cria uma nova conta bancária"""
-        try:
-            data_criacao = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-            
-            self.cursor.execute('''
-                INSERT INTO contas (numero, titular, email, cpf, saldo, data_criacao, tipo_conta)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (numero, titular, email, cpf, saldo_inicial, data_criacao, tipo_conta))
-            
-            if saldo_inicial > 0:
-                self.registrar_transacao(
-                    conta_origem=None,
-                    conta_destino=numero,
-                    tipo='DEPOSITO_INICIAL',
-                    valor=saldo_inicial,
-                    descricao=f"Depósito inicial - {tipo_conta}"
-                )
-            
-            self.conn.commit()
-            return True, "Conta criada com sucesso!"
-        except sqlite3.IntegrityError as e:
-            return False, "Erro: Número da conta ou CPF já existente!"
-    
-    def registrar_transacao(self, conta_origem, conta_destino, tipo, valor, descricao=""):
-        """Registra uma transação no banco de dados"""
-        data = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-        
-        self.cursor.execute('''
-            INSERT INTO transacoes (conta_origem, conta_destino, tipo, valor, descricao, data)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (conta_origem, conta_destino, tipo, valor, descricao, data))
-        
-        self.conn.commit()
-    
-    def depositar(self, conta, valor):
-        """Realiza depósito em conta"""
-        if valor <= 0:
-            return False, "Valor deve ser positivo!"
-        
-        self.cursor.execute('SELECT saldo FROM contas WHERE numero = ?', (conta,))
-        resultado = self.cursor.fetchone()
-        
-        if not resultado:
-            return False, "Conta não encontrada!"
-        
-        novo_saldo = resultado[0] + valor
-        
-        self.cursor.execute(
-            'UPDATE contas SET saldo = ? WHERE numero = ?',
-            (novo_saldo, conta)
-        )
-        
-        self.registrar_transacao(
-            conta_origem=None,
-            conta_destino=conta,
-            tipo='DEPOSITO',
-            valor=valor,
-            descricao="Depósito em conta"
-        )
-        
-        self.conn.commit()
-        return True, f"Depósito de R$ {valor:.2f} realizado com sucesso!"
-    
-    def sacar(self, conta, valor):
-        """Realiza saque de conta"""
-        if valor <= 0:
-            return False, "Valor deve ser positivo!"
-        
-        self.cursor.execute('SELECT saldo FROM contas WHERE numero = ?', (conta,))
-        resultado = self.cursor.fetchone()
-        
-        if not resultado:
-            return False, "Conta não encontrada!"
-        
-        saldo_atual = resultado[0]
-        
-        if saldo_atual < valor:
-            return False, "Saldo insuficiente!"
-        
-        novo_saldo = saldo_atual - valor
-        
-        self.cursor.execute(
-            'UPDATE contas SET saldo = ? WHERE numero = ?',
-            (novo_saldo, conta)
-        )
-        
-        self.registrar_transacao(
-            conta_origem=conta,
-            conta_destino=None,
-            tipo='SAQUE',
-            valor=valor,
-            descricao="Saque em conta"
-        )
-        
-        self.conn.commit()
-        return True, f"Saque de R$ {valor:.2f} realizado com sucesso!"
-    
-    def transferir(self, conta_origem, conta_destino, valor):
-        """Realiza transferência entre contas"""
-        if valor <= 0:
-            return False, "Valor deve ser positivo!"
-        
-        # Verifica se as contas existem
-        self.cursor.execute('SELECT saldo FROM contas WHERE numero = ?', (conta_origem,))
-        resultado_origem = self.cursor.fetchone()
-        
-        self.cursor.execute('SELECT saldo FROM contas WHERE numero = ?', (conta_destino,))
-        resultado_destino = self.cursor.fetchone()
-        
-        if not resultado_origem:
-            return False, "Conta de origem não encontrada!"
-        if not resultado_destino:
-            return False, "Conta de destino não encontrada!"
-        
-        saldo_origem = resultado_origem[0]
-        
-        if saldo_origem < valor:
-            return False, "Saldo insuficiente para transferência!"
-        
-        # Atualiza saldos
-        novo_saldo_origem = saldo_origem - valor
-        novo_saldo_destino = resultado_destino[0] + valor
-        
-        self.cursor.execute(
-            'UPDATE contas SET saldo = ? WHERE numero = ?',
-            (novo_saldo_origem, conta_origem)
-        )
-        
-        self.cursor.execute(
-            'UPDATE contas SET saldo = ? WHERE numero = ?',
-            (novo_saldo_destino, conta_destino)
-        )
-        
-        # Registra transação
-        self.registrar_transacao(
-            conta_origem=conta_origem,
-            conta_destino=conta_destino,
-            tipo='TRANSFERENCIA',
-            valor=valor,
-            descricao=f"Transferência para {conta_destino}"
-        )
-        
-        self.conn.commit()
-        return True, f"Transferência de R$ {valor:.2f} realizada com sucesso!"
-    
-    def consultar_saldo(self, conta):
-        """Consulta saldo da conta"""
-        self.cursor.execute('SELECT saldo, titular FROM contas WHERE numero = ?', (conta,))
-        resultado = self.cursor.fetchone()
-        
-        if resultado:
-            return True, resultado[0], resultado[1]
-        return False, 0, ""
-    
-    def obter_extrato(self, conta, limite=20):
-        """Obtém extrato da conta"""
-        self.cursor.execute('''
-            SELECT data, tipo, valor, descricao, conta_origem, conta_destino
-            FROM transacoes 
-            WHERE conta_origem = ? OR conta_destino = ?
-            ORDER BY id DESC
-            LIMIT ?
-        ''', (conta, conta, limite))
-        
-        return self.cursor.fetchall()
-    
-    def obter_contas(self):
-        """Obtém todas as contas cadastradas"""
-        self.cursor.execute('''
-            SELECT numero, titular, email, cpf, saldo, data_criacao, tipo_conta
-            FROM contas 
-            ORDER BY data_criacao DESC
-        ''')
-        return self.cursor.fetchall()
-    
-    def obter_estatisticas(self):
-        """Obtém estatísticas do banco"""
-        self.cursor.execute('SELECT COUNT(*), SUM(saldo) FROM contas')
-        total_contas, saldo_total = self.cursor.fetchone()
-        
-        self.cursor.execute('SELECT COUNT(*) FROM transacoes')
-        total_transacoes = self.cursor.fetchone()[0]
-        
-        return total_contas, saldo_total or 0, total_transacoes
+@st.cache_resource
+def criar_banco():
+    """Cria o banco no modo configurado (BANKTECH_SHARDS=N ativa o modo fragmentado).
+    
+    Uma instância por processo: conexões, recuperação de transferências e
+    limites são inicializados uma vez, não a cada rerun.
+    """
+    total_shards = int(os.environ.get('BANKTECH_SHARDS', '0') or 0)
+    if total_shards > 1:
+        from shards import BancoFragmentado
+        return BancoFragmentado(total_shards)
+    return BancoDigital()
 
 def main():
     # Inicializa o sistema bancário
-    banco = BancoDigital()
+    banco = criar_banco()
     
     # Verifica se o usuário está logado
     if 'logado' not in st.session_state:
@@ -315,10 +75,68 @@ def main():
     # Página de login se não estiver logado
     if not st.session_state.logado:
         render_login_page(banco)
+        registrar_tempo_primeira_pagina()
         return
     
     # Menu principal após login
     render_main_page(banco)
+    registrar_tempo_primeira_pagina()
+
+def registrar_tempo_primeira_pagina():
+    """Mede o tempo até a primeira página renderizada"""
+    if st.session_state.get('tempo_primeira_pagina') is not None:
+        return
+    
+    tempo_script = time.perf_counter() - _INICIO_SCRIPT
+    st.session_state.tempo_primeira_pagina = tempo_script
+    
+    # run.sh informa o instante do lançamento; só a primeira página do processo consome
+    inicio_lancamento = os.environ.pop('BANKTECH_INICIO', None)
+    if inicio_lancamento is None:
+        return
+    
+    tempo_total = time.time() - float(inicio_lancamento)
+    os.makedirs('database', exist_ok=True)
+    with open('database/metricas_inicializacao.csv', 'a', encoding='utf-8') as arquivo:
+        arquivo.write(f"{datetime.now().strftime('%d/%m/%Y %H:%M:%S')},{tempo_total:.3f},{tempo_script:.3f}\n")
+    print(f"⏱️ Primeira página em {tempo_total:.2f}s (script: {tempo_script:.3f}s)")
+
+# Snapshot mais antigo que isso (em segundos) não é usado nas telas gerenciais
+DEFASAGEM_MAXIMA_SNAPSHOT = 300
+
+def obter_fonte_relatorios(banco):
+    """Retorna o snapshot analítico para o gerente, ou o próprio banco.
+    
+    Funcionários atendem clientes e sempre leem saldos e contas do banco; o
+    gerente usa o snapshot enquanto ele tiver até DEFASAGEM_MAXIMA_SNAPSHOT.
+    """
+    if st.session_state.cargo != 'GERENTE':
+        return banco
+    
+    from analitico import RelatorioAnalitico
+    
+    relatorio = RelatorioAnalitico()
+    if not relatorio.disponivel():
+        return banco
+    defasagem = relatorio.defasagem()
+    if defasagem is None or defasagem > DEFASAGEM_MAXIMA_SNAPSHOT:
+        return banco
+    return relatorio
+
+def exibir_defasagem(fonte):
+    """Mostra há quanto tempo o snapshot analítico foi atualizado"""
+    if not hasattr(fonte, 'defasagem'):
+        st.caption("🔴 Dados em tempo real")
+        return
+    
+    defasagem = fonte.defasagem() or 0
+    if defasagem < 60:
+        texto = f"{defasagem:.0f}s"
+    elif defasagem < 3600:
+        texto = f"{defasagem / 60:.0f} min"
+    else:
+        texto = f"{defasagem / 3600:.1f} h"
+    st.caption(f"📸 Snapshot analítico atualizado há {texto}")
 
 def render_login_page(banco):
     """Renderiza a página de login"""
@@ -365,6 +183,7 @@ def render_main_page(banco):
             "💰 Operações",
             "📋 Consultar Contas",
             "🔄 Transações",
+            "📈 Relatórios",
             "⚙️ Administração"
         ]
         
@@ -388,6 +207,8 @@ def render_main_page(banco):
         render_consultar_contas(banco)
     elif selected_menu == "🔄 Transações":
         render_transacoes(banco)
+    elif selected_menu == "📈 Relatórios":
+        render_relatorios(banco)
     elif selected_menu == "⚙️ Administração":
         render_administracao(banco)
 
@@ -395,8 +216,10 @@ def render_dashboard(banco):
     """Renderiza o dashboard"""
     st.markdown('<h1 class="main-header">📊 Dashboard</h1>', unsafe_allow_html=True)
     
-    # Estatísticas
-    total_contas, saldo_total, total_transacoes = banco.obter_estatisticas()
+    # Estatísticas (do snapshot analítico, quando disponível)
+    fonte = obter_fonte_relatorios(banco)
+    total_contas, saldo_total, total_transacoes = fonte.obter_estatisticas()
+    exibir_defasagem(fonte)
     
     col1, col2, col3 = st.columns(3)
     
@@ -411,7 +234,7 @@ def render_dashboard(banco):
     
     # Últimas contas criadas
     st.subheader("📈 Últimas Contas Criadas")
-    contas = banco.obter_contas()[:5]  # Últimas 5 contas
+    contas = fonte.obter_contas()[:5]  # Últimas 5 contas
     
     if contas:
         dados_contas = []
@@ -424,6 +247,7 @@ def render_dashboard(banco):
                 'Data Criação': conta[5]
             })
         
+        import pandas as pd
         df = pd.DataFrame(dados_contas)
         st.dataframe(df, use_container_width=True)
     else:
@@ -539,7 +363,9 @@ def render_consultar_contas(banco):
     """Renderiza a consulta de contas"""
     st.markdown('<h1 class="main-header">📋 Consultar Contas</h1>', unsafe_allow_html=True)
     
-    contas = banco.obter_contas()
+    fonte = obter_fonte_relatorios(banco)
+    contas = fonte.obter_contas()
+    exibir_defasagem(fonte)
     
     if contas:
         dados_contas = []
@@ -554,6 +380,7 @@ def render_consultar_contas(banco):
                 'Tipo': conta[6]
             })
         
+        import pandas as pd
         df = pd.DataFrame(dados_contas)
         
         # Filtros
@@ -623,6 +450,7 @@ def render_transacoes(banco):
                     'Valor': valor_formatado
                 })
             
+            import pandas as pd
             df_extrato = pd.DataFrame(dados_extrato)
             st.dataframe(df_extrato, use_container_width=True)
         else:
@@ -633,17 +461,9 @@ def render_transacoes(banco):
         st.markdown("---")
         st.subheader("📋 Todas as Transações (Visão Gerencial)")
         
-        banco.cursor.execute('''
-            SELECT t.data, t.tipo, t.valor, t.descricao, 
-                   c1.titular as origem, c2.titular as destino
-            FROM transacoes t
-            LEFT JOIN contas c1 ON t.conta_origem = c1.numero
-            LEFT JOIN contas c2 ON t.conta_destino = c2.numero
-            ORDER BY t.id DESC
-            LIMIT 100
-        ''')
-        
-        todas_transacoes = banco.cursor.fetchall()
+        fonte = obter_fonte_relatorios(banco)
+        todas_transacoes = fonte.obter_todas_transacoes(limite=100)
+        exibir_defasagem(fonte)
         
         if todas_transacoes:
             dados_todas = []
@@ -657,9 +477,57 @@ def render_transacoes(banco):
                     'Destino': transacao[5] or 'SISTEMA'
                 })
             
+            import pandas as pd
             df_todas = pd.DataFrame(dados_todas)
             st.dataframe(df_todas, use_container_width=True)
 
+def render_relatorios(banco):
+    """Renderiza os relatórios gerenciais calculados sobre o snapshot analítico"""
+    if st.session_state.cargo != 'GERENTE':
+        st.warning("⚠️ Acesso restrito a gerentes!")
+        return
+    
+    st.markdown('<h1 class="main-header">📈 Relatórios Gerenciais</h1>', unsafe_allow_html=True)
+    
+    from analitico import RelatorioAnalitico, atualizar_snapshot
+    
+    if st.button("🔄 Atualizar Snapshot"):
+        with st.spinner("Atualizando snapshot..."):
+            novas = atualizar_snapshot(getattr(banco, 'total_shards', 0))
+        st.success(f"Snapshot atualizado com {novas} novas transações!")
+    
+    relatorio = RelatorioAnalitico()
+    if not relatorio.disponivel():
+        st.info("Snapshot analítico ainda não gerado. Clique em \"Atualizar Snapshot\" ou rode `python analitico.py`.")
+        return
+    
+    exibir_defasagem(relatorio)
+    meses = st.multiselect("Meses:", relatorio.meses())
+    
+    st.subheader("💸 Volume por Tipo")
+    volume = relatorio.volume_por_tipo(meses)
+    st.dataframe(volume.rename(columns={
+        'tipo': 'Tipo',
+        'quantidade': 'Quantidade',
+        'valor_total': 'Valor Total'
+    }), use_container_width=True)
+    
+    st.subheader("🏆 Contas com Maior Movimentação")
+    top = relatorio.top_contas(10, meses)
+    st.dataframe(top.rename(columns={
+        'numero': 'Número',
+        'movimentacoes': 'Movimentações',
+        'volume': 'Volume',
+        'titular': 'Titular',
+        'tipo_conta': 'Tipo',
+        'saldo': 'Saldo'
+    }), use_container_width=True)
+    
+    st.subheader("📅 Fluxo Diário")
+    fluxo = relatorio.fluxo_diario(meses)
+    if not fluxo.empty:
+        st.line_chart(fluxo.set_index('dia')[['entradas', 'saidas', 'liquido']])
+
 def render_administracao(banco):
     """Renderiza a área administrativa"""
     if st.session_state.cargo != 'GERENTE':
@@ -668,7 +536,7 @@ def render_administracao(banco):
     
     st.markdown('<h1 class="main-header">⚙️ Área Administrativa</h1>', unsafe_allow_html=True)
     
-    tab1, tab2 = st.tabs(["👥 Gerenciar Usuários", "💾 Backup do Sistema"])
+    tab1, tab2, tab3 = st.tabs(["👥 Gerenciar Usuários", "💾 Backup do Sistema", "🧮 Conciliação"])
     
     with tab1:
         st.subheader("Gerenciar Usuários")
@@ -687,23 +555,17 @@ def render_administracao(banco):
             
             if st.form_submit_button("➕ Adicionar Usuário"):
                 if novo_username and novo_nome and nova_senha:
-                    try:
-                        senha_hash = banco.hash_password(nova_senha)
-                        banco.cursor.execute('''
-                            INSERT INTO usuarios (username, senha_hash, nome, cargo)
-                            VALUES (?, ?, ?, ?)
-                        ''', (novo_username, senha_hash, novo_nome, novo_cargo))
-                        banco.conn.commit()
-                        st.success("Usuário criado com sucesso!")
-                    except sqlite3.IntegrityError:
-                        st.error("Username já existe!")
+                    sucesso, mensagem = banco.criar_usuario(novo_username, nova_senha, novo_nome, novo_cargo)
+                    if sucesso:
+                        st.success(mensagem)
+                    else:
+                        st.error(mensagem)
                 else:
                     st.warning("Preencha todos os campos!")
         
         # Lista de usuários existentes
         st.write("### Usuários do Sistema")
-        banco.cursor.execute('SELECT username, nome, cargo FROM usuarios')
-        usuarios = banco.cursor.fetchall()
+        usuarios = banco.obter_usuarios()
         
         if usuarios:
             dados_usuarios = []
@@ -714,6 +576,7 @@ def render_administracao(banco):
                     'Cargo': usuario[2]
                 })
             
+            import pandas as pd
             df_usuarios = pd.DataFrame(dados_usuarios)
             st.dataframe(df_usuarios, use_container_width=True)
     
@@ -738,6 +601,7 @@ def render_administracao(banco):
                 # Exportar contas para CSV
                 contas = banco.obter_contas()
                 if contas:
+                    import pandas as pd
                     df_export = pd.DataFrame(contas, columns=[
                         'Número', 'Titular', 'E-mail', 'CPF', 'Saldo', 'Data_Criação', 'Tipo'
                     ])
@@ -748,6 +612,38 @@ def render_administracao(banco):
                         file_name="contas_bancarias.csv",
                         mime="text/csv"
                     )
+    
+    with tab3:
+        st.subheader("Conciliação Razão x Saldo")
+        st.write("Compara o saldo de cada conta com o líquido das suas transações.")
+        
+        if st.button("🧮 Executar Conciliação"):
+            from conciliacao import conciliar
+            
+            with st.spinner("Conciliando..."):
+                resultados = conciliar(getattr(banco, 'total_shards', 0))
+            
+            for resultado in resultados:
+                divergencias = resultado['divergencias']
+                st.write(f"**{resultado['arquivo']}** — execução #{resultado['execucao_id']}")
+                
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("Contas Conciliadas", resultado['contas'])
+                with col2:
+                    st.metric("Divergências", len(divergencias))
+                with col3:
+                    st.metric("Duração", f"{resultado['duracao']:.2f}s")
+                
+                if divergencias.empty:
+                    st.success("Nenhuma divergência encontrada!")
+                else:
+                    st.dataframe(divergencias.rename(columns={
+                        'conta': 'Conta',
+                        'saldo': 'Saldo',
+                        'saldo_razao': 'Saldo pelo Razão',
+                        'diferenca': 'Diferença'
+                    }), use_container_width=True)
 
 if __name__ == "__main__":
     main()
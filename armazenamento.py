@@ -0,0 +1,43 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from migracoes import MIGRACOES, MIGRACOES_SHARD
+
+class Conexao(sqlite3.Connection):
+    """Conexão com uma trava própria, usada por transacao() quando compartilhada entre threads"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.trava = threading.RLock()
+
+def conectar(caminho):
+    """Abre uma conexão em modo WAL, com transações controladas explicitamente"""
+    conn = sqlite3.connect(caminho, timeout=30, isolation_level=None, check_same_thread=False,
+                           factory=Conexao)
+    conn.execute('PRAGMA journal_mode=WAL')
+    return conn
+
+def arquivos_do_banco(total_shards=0):
+    """Lista os arquivos de banco a processar e as migrações de cada um"""
+    if total_shards > 1:
+        return [(os.path.join('database/shards', f'banco_shard_{indice}.db'), MIGRACOES_SHARD)
+                for indice in range(total_shards)]
+    return [('database/banco_digital.db', MIGRACOES)]
+
+@contextmanager
+def transacao(conn):
+    """Executa o bloco entre BEGIN IMMEDIATE e COMMIT (ROLLBACK em caso de erro).
+
+    A conexão do app é compartilhada pelas sessões do Streamlit (threads), então
+    a transação inteira roda sob a trava da conexão.
+    """
+    with conn.trava:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
@@ -0,0 +1,304 @@
+import sqlite3
+import hashlib
+import os
+import time
+from datetime import datetime
+
+from armazenamento import conectar, transacao
+from limites import limites_do_processo
+from migracoes import aplicar_migracoes
+from outbox import publicar
+
+class BancoDigital:
+    def __init__(self):
+        self.init_database()
+    
+    def init_database(self):
+        """Inicializa o banco de dados SQLite"""
+        os.makedirs('database', exist_ok=True)
+        # WAL: leituras longas (relatórios, conciliação) não bloqueiam os lançamentos.
+        # As escritas usam transacao() (BEGIN IMMEDIATE), então o saldo lido e o
+        # atualizado pertencem à mesma transação, mesmo com o lote de juros rodando.
+        self.conn = conectar('database/banco_digital.db')
+        
+        # Aplica apenas as migrações pendentes (PRAGMA user_version)
+        aplicar_migracoes(self.conn)
+        
+        # Limites de velocidade em memória, reconstruídos uma vez por processo
+        self.limites = limites_do_processo('database/banco_digital.db', [self.conn])
+    
+    def hash_password(self, password):
+        """Gera hash da senha"""
+        return hashlib.sha256(password.encode()).hexdigest()
+    
+    def criar_usuario(self, username, senha, nome, cargo='FUNCIONARIO'):
+        """Cria um usuário (funcionário) do sistema"""
+        try:
+            with transacao(self.conn):
+                self.conn.execute('''
+                    INSERT INTO usuarios (username, senha_hash, nome, cargo)
+                    VALUES (?, ?, ?, ?)
+                ''', (username, self.hash_password(senha), nome, cargo))
+                
+                publicar(self.conn, 'USUARIO_CRIADO', None, {
+                    'username': username,
+                    'nome': nome,
+                    'cargo': cargo
+                })
+            return True, "Usuário criado com sucesso!"
+        except sqlite3.IntegrityError:
+            return False, "Username já existe!"
+    
+    def verificar_login(self, username, password):
+        """Verifica credenciais de login"""
+        senha_hash = self.hash_password(password)
+        cursor = self.conn.execute(
+            'SELECT * FROM usuarios WHERE username = ? AND senha_hash = ?',
+            (username, senha_hash)
+        )
+        return cursor.fetchone()
+    
+    def obter_usuarios(self):
+        """Obtém os usuários (funcionários) do sistema"""
+        cursor = self.conn.execute('SELECT username, nome, cargo FROM usuarios')
+        return cursor.fetchall()
+    
+    def _conn_da_conta(self, conta):
+        """Conexão do arquivo que guarda a conta (e seus lançamentos)"""
+        return self.conn
+    
+    def criar_conta(self, numero, titular, email, cpf, saldo_inicial=0.0, tipo_conta='CORRENTE'):
+        """Cria uma nova conta bancária"""
+        conn = self._conn_da_conta(numero)
+        try:
+            with transacao(conn):
+                data_criacao = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+                
+                conn.execute('''
+                    INSERT INTO contas (numero, titular, email, cpf, saldo, data_criacao, tipo_conta)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (numero, titular, email, cpf, saldo_inicial, data_criacao, tipo_conta))
+                
+                publicar(conn, 'CONTA_CRIADA', numero, {
+                    'numero': numero,
+                    'titular': titular,
+                    'email': email,
+                    'cpf': cpf,
+                    'tipo_conta': tipo_conta,
+                    'data_criacao': data_criacao
+                })
+                
+                if saldo_inicial > 0:
+                    self.registrar_transacao(
+                        conta_origem=None,
+                        conta_destino=numero,
+                        tipo='DEPOSITO_INICIAL',
+                        valor=saldo_inicial,
+                        descricao=f"Depósito inicial - {tipo_conta}"
+                    )
+            return True, "Conta criada com sucesso!"
+        except sqlite3.IntegrityError:
+            return False, "Erro: Número da conta ou CPF já existente!"
+    
+    def registrar_transacao(self, conta_origem, conta_destino, tipo, valor, descricao=""):
+        """Registra uma transação e o evento correspondente no outbox.
+        
+        Deve ser chamado dentro de transacao() na conexão da conta dona do
+        lançamento: o lançamento, o evento e a alteração de saldo feita por
+        quem chama são confirmados juntos.
+        """
+        # O crédito de uma transferência entre shards pertence à conta de destino
+        conta = conta_destino if tipo == 'TRANSFERENCIA_RECEBIDA' else conta_origem or conta_destino
+        conn = self._conn_da_conta(conta)
+        data = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+        
+        cursor = conn.execute('''
+            INSERT INTO transacoes (conta_origem, conta_destino, tipo, valor, descricao, data, criado_em)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (conta_origem, conta_destino, tipo, valor, descricao, data, time.time()))
+        
+        publicar(conn, 'TRANSACAO', conta, {
+            'id': cursor.lastrowid,
+            'conta_origem': conta_origem,
+            'conta_destino': conta_destino,
+            'tipo': tipo,
+            'valor': valor,
+            'descricao': descricao,
+            'data': data
+        })
+    
+    def depositar(self, conta, valor):
+        """Realiza depósito em conta"""
+        if valor <= 0:
+            return False, "Valor deve ser positivo!"
+        
+        conn = self._conn_da_conta(conta)
+        with transacao(conn):
+            # Atualização relativa: não sobrescreve lançamentos confirmados por outro processo
+            cursor = conn.execute(
+                'UPDATE contas SET saldo = saldo + ? WHERE numero = ?',
+                (valor, conta)
+            )
+            
+            if cursor.rowcount == 0:
+                return False, "Conta não encontrada!"
+            
+            self.registrar_transacao(
+                conta_origem=None,
+                conta_destino=conta,
+                tipo='DEPOSITO',
+                valor=valor,
+                descricao="Depósito em conta"
+            )
+        
+        return True, f"Depósito de R$ {valor:.2f} realizado com sucesso!"
+    
+    def sacar(self, conta, valor):
+        """Realiza saque de conta"""
+        if valor <= 0:
+            return False, "Valor deve ser positivo!"
+        
+        conn = self._conn_da_conta(conta)
+        with conn.trava:
+            with transacao(conn):
+                resultado = conn.execute(
+                    'SELECT saldo, tipo_conta FROM contas WHERE numero = ?', (conta,)
+                ).fetchone()
+                
+                if not resultado:
+                    return False, "Conta não encontrada!"
+                
+                if resultado[0] < valor:
+                    return False, "Saldo insuficiente!"
+                
+                recusa = self.limites.verificar(conta, resultado[1], valor, transferencia=False)
+                if recusa:
+                    return False, recusa
+                
+                conn.execute(
+                    'UPDATE contas SET saldo = saldo - ? WHERE numero = ?',
+                    (valor, conta)
+                )
+                
+                self.registrar_transacao(
+                    conta_origem=conta,
+                    conta_destino=None,
+                    tipo='SAQUE',
+                    valor=valor,
+                    descricao="Saque em conta"
+                )
+            
+            # Só conta no limite depois do commit: uma escrita que falhou não consome o limite
+            self.limites.registrar(conta, resultado[1], valor, transferencia=False)
+        
+        return True, f"Saque de R$ {valor:.2f} realizado com sucesso!"
+    
+    def transferir(self, conta_origem, conta_destino, valor):
+        """Realiza transferência entre contas do mesmo arquivo, em uma única transação"""
+        if valor <= 0:
+            return False, "Valor deve ser positivo!"
+        if conta_origem == conta_destino:
+            return False, "Conta de origem e destino devem ser diferentes!"
+        
+        conn = self._conn_da_conta(conta_origem)
+        with conn.trava:
+            with transacao(conn):
+                # Verifica se as contas existem
+                resultado_origem = conn.execute(
+                    'SELECT saldo, tipo_conta FROM contas WHERE numero = ?', (conta_origem,)
+                ).fetchone()
+                resultado_destino = conn.execute(
+                    'SELECT 1 FROM contas WHERE numero = ?', (conta_destino,)
+                ).fetchone()
+                
+                if not resultado_origem:
+                    return False, "Conta de origem não encontrada!"
+                if not resultado_destino:
+                    return False, "Conta de destino não encontrada!"
+                
+                if resultado_origem[0] < valor:
+                    return False, "Saldo insuficiente para transferência!"
+                
+                recusa = self.limites.verificar(conta_origem, resultado_origem[1], valor, transferencia=True)
+                if recusa:
+                    return False, recusa
+                
+                # Atualiza saldos
+                conn.execute(
+                    'UPDATE contas SET saldo = saldo - ? WHERE numero = ?',
+                    (valor, conta_origem)
+                )
+                
+                conn.execute(
+                    'UPDATE contas SET saldo = saldo + ? WHERE numero = ?',
+                    (valor, conta_destino)
+                )
+                
+                # Registra transação
+                self.registrar_transacao(
+                    conta_origem=conta_origem,
+                    conta_destino=conta_destino,
+                    tipo='TRANSFERENCIA',
+                    valor=valor,
+                    descricao=f"Transferência para {conta_destino}"
+                )
+            
+            # Só conta no limite depois do commit
+            self.limites.registrar(conta_origem, resultado_origem[1], valor, transferencia=True)
+        
+        return True, f"Transferência de R$ {valor:.2f} realizada com sucesso!"
+    
+    def consultar_saldo(self, conta):
+        """Consulta saldo da conta"""
+        cursor = self._conn_da_conta(conta).execute(
+            'SELECT saldo, titular FROM contas WHERE numero = ?', (conta,)
+        )
+        resultado = cursor.fetchone()
+        
+        if resultado:
+            return True, resultado[0], resultado[1]
+        return False, 0, ""
+    
+    def obter_extrato(self, conta, limite=20):
+        """Obtém extrato da conta"""
+        cursor = self._conn_da_conta(conta).execute('''
+            SELECT data, tipo, valor, descricao, conta_origem, conta_destino
+            FROM transacoes 
+            WHERE conta_origem = ? OR conta_destino = ?
+            ORDER BY id DESC
+            LIMIT ?
+        ''', (conta, conta, limite))
+        
+        return cursor.fetchall()
+    
+    def obter_contas(self):
+        """Obtém todas as contas cadastradas"""
+        cursor = self.conn.execute('''
+            SELECT numero, titular, email, cpf, saldo, data_criacao, tipo_conta
+            FROM contas 
+            ORDER BY data_criacao DESC
+        ''')
+        return cursor.fetchall()
+    
+    def obter_estatisticas(self):
+        """Obtém estatísticas do banco"""
+        cursor = self.conn.execute('SELECT COUNT(*), SUM(saldo) FROM contas')
+        total_contas, saldo_total = cursor.fetchone()
+        
+        cursor = self.conn.execute('SELECT COUNT(*) FROM transacoes')
+        total_transacoes = cursor.fetchone()[0]
+        
+        return total_contas, saldo_total or 0, total_transacoes
+    
+    def obter_todas_transacoes(self, limite=100):
+        """Obtém as últimas transações com o nome dos titulares (visão gerencial)"""
+        cursor = self.conn.execute('''
+            SELECT t.data, t.tipo, t.valor, t.descricao, 
+                   c1.titular as origem, c2.titular as destino
+            FROM transacoes t
+            LEFT JOIN contas c1 ON t.conta_origem = c1.numero
+            LEFT JOIN contas c2 ON t.conta_destino = c2.numero
+            ORDER BY t.id DESC
+            LIMIT ?
+        ''', (limite,))
+        return cursor.fetchall()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Conciliação do razão (transacoes) contra o saldo das contas
+"""
+
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from armazenamento import arquivos_do_banco, conectar, transacao
+from migracoes import aplicar_migracoes
+
+# Abaixo deste número de lançamentos a soma roda no próprio processo
+LIMIAR_PARALELO = 500000
+
+# Diferenças menores que meio centavo são erro de arredondamento
+TOLERANCIA = 0.005
+
+def somar_faixa(caminho, inicio, fim):
+    """Soma créditos e débitos por conta em uma faixa de ids do razão"""
+    conn = sqlite3.connect(f'file:{caminho}?mode=ro', uri=True, timeout=30)
+    try:
+        creditos = conn.execute('''
+            SELECT conta_destino, SUM(valor)
+            FROM transacoes
+            WHERE id BETWEEN ? AND ? AND conta_destino IS NOT NULL
+            GROUP BY conta_destino
+        ''', (inicio, fim)).fetchall()
+        debitos = conn.execute('''
+            SELECT conta_origem, SUM(valor)
+            FROM transacoes
+            WHERE id BETWEEN ? AND ? AND conta_origem IS NOT NULL
+            GROUP BY conta_origem
+        ''', (inicio, fim)).fetchall()
+    finally:
+        conn.close()
+    return creditos, debitos
+
+def dividir_faixas(ultimo_id, partes):
+    """Divide os ids 1..ultimo_id em faixas contíguas"""
+    tamanho = max(1, -(-ultimo_id // partes))
+    return [(inicio, min(inicio + tamanho - 1, ultimo_id)) for inicio in range(1, ultimo_id + 1, tamanho)]
+
+def _somar(linhas):
+    """Agrupa (conta, valor) parciais em uma Series por conta"""
+    if not linhas:
+        return pd.Series(dtype=float)
+    return pd.DataFrame(linhas, columns=['conta', 'valor']).groupby('conta')['valor'].sum()
+
+def conciliar_arquivo(caminho, migracoes, processos=None):
+    """Concilia um arquivo de banco e grava as divergências no relatório.
+
+    Saldos e o último id do razão são lidos na mesma transação de leitura
+    (snapshot WAL, que não bloqueia quem está lançando). O razão é append-only,
+    então as faixas até esse id somadas depois pelos workers correspondem ao
+    mesmo snapshot.
+    """
+    inicio = time.perf_counter()
+    conn = conectar(caminho)
+    aplicar_migracoes(conn, migracoes)
+
+    conn.execute('BEGIN')
+    ultimo_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM transacoes').fetchone()[0]
+    contas = conn.execute('SELECT numero, saldo FROM contas').fetchall()
+    conn.execute('COMMIT')
+
+    saldos = pd.Series(dict(contas), dtype=float)
+
+    processos = processos or os.cpu_count() or 1
+    if ultimo_id >= LIMIAR_PARALELO and processos > 1:
+        faixas = dividir_faixas(ultimo_id, processos * 4)
+        with ProcessPoolExecutor(max_workers=processos, mp_context=multiprocessing.get_context('spawn')) as executor:
+            parciais = list(executor.map(somar_faixa, [caminho] * len(faixas), *zip(*faixas)))
+    else:
+        parciais = [somar_faixa(caminho, 1, ultimo_id)]
+
+    creditos = _somar([linha for parcial in parciais for linha in parcial[0]])
+    debitos = _somar([linha for parcial in parciais for linha in parcial[1]])
+    saldo_razao = creditos.sub(debitos, fill_value=0.0).reindex(saldos.index, fill_value=0.0)
+
+    diferenca = saldos - saldo_razao
+    divergentes = diferenca.abs() > TOLERANCIA
+    relatorio = pd.DataFrame({
+        'conta': saldos.index[divergentes],
+        'saldo': saldos[divergentes].round(2).values,
+        'saldo_razao': saldo_razao[divergentes].round(2).values,
+        'diferenca': diferenca[divergentes].round(2).values,
+    })
+
+    duracao = time.perf_counter() - inicio
+    with transacao(conn):
+        execucao_id = conn.execute('''
+            INSERT INTO execucoes_conciliacao (data, ultimo_id, contas, divergencias, duracao)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (datetime.now().strftime("%d/%m/%Y %H:%M:%S"), ultimo_id, len(saldos), len(relatorio), duracao)).lastrowid
+        conn.executemany('''
+            INSERT INTO divergencias_conciliacao (execucao_id, conta, saldo, saldo_razao, diferenca)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [(execucao_id, *linha) for linha in relatorio.itertuples(index=False, name=None)])
+    conn.close()
+
+    return {
+        'arquivo': caminho,
+        'execucao_id': execucao_id,
+        'ultimo_id': ultimo_id,
+        'contas': len(saldos),
+        'divergencias': relatorio,
+        'duracao': duracao,
+    }
+
+def conciliar(total_shards=0, processos=None):
+    """Concilia o banco principal ou todos os shards"""
+    return [conciliar_arquivo(caminho, migracoes, processos)
+            for caminho, migracoes in arquivos_do_banco(total_shards)]
+
+def main():
+    """Executa a conciliação pela linha de comando"""
+    parser = argparse.ArgumentParser(description="Conciliação razão x saldo")
+    parser.add_argument('--shards', type=int, default=int(os.environ.get('BANKTECH_SHARDS', '0') or 0),
+                        help="Número de shards (modo fragmentado)")
+    parser.add_argument('--processos', type=int, help="Processos para somar o razão")
+    args = parser.parse_args()
+
+    for resultado in conciliar(args.shards, args.processos):
+        divergencias = resultado['divergencias']
+        print(f"{'✅' if divergencias.empty else '❌'} {resultado['arquivo']}: "
+              f"{resultado['contas']} contas, {len(divergencias)} divergências "
+              f"(até o lançamento {resultado['ultimo_id']}, {resultado['duracao']:.2f}s)")
+        if not divergencias.empty:
+            print(divergencias.head(20).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
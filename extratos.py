@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Geração em lote dos extratos mensais de todas as contas
+"""
+
+import argparse
+import csv
+import html
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import groupby
+
+from armazenamento import arquivos_do_banco, conectar
+
+# Contas enviadas a cada worker por vez
+CONTAS_POR_LOTE = 500
+
+def periodo_da_competencia(competencia):
+    """Retorna o intervalo [início, fim) da competência AAAA-MM em epoch"""
+    ano, mes = (int(parte) for parte in competencia.split('-'))
+    inicio = datetime(ano, mes, 1)
+    fim = datetime(ano + 1, 1, 1) if mes == 12 else datetime(ano, mes + 1, 1)
+    return inicio.timestamp(), fim.timestamp()
+
+def descrever(conta, tipo, descricao, conta_origem, conta_destino):
+    """Descrição do lançamento do ponto de vista da conta"""
+    if tipo == 'SAQUE':
+        return f"Saque - {descricao}"
+    if tipo == 'DEPOSITO':
+        return f"Depósito - {descricao}"
+    if tipo in ('TRANSFERENCIA', 'TRANSFERENCIA_RECEBIDA'):
+        if conta_destino == conta:
+            return f"Transferência recebida de {conta_origem}"
+        return f"Transferência enviada para {conta_destino}"
+    return descricao
+
+def sinal_do_lancamento(conta, conta_origem, conta_destino):
+    """1 para crédito, -1 para débito e 0 para transferência da conta para ela mesma"""
+    if conta_origem == conta_destino:
+        return 0
+    return -1 if conta_origem == conta else 1
+
+def renderizar_lote(lote, diretorio, competencia, formatos):
+    """Grava os arquivos de extrato de um lote de contas (executado nos workers)"""
+    for conta, titular, tipo_conta, saldo_inicial, lancamentos in lote:
+        linhas = []
+        saldo = saldo_inicial
+        for data, tipo, valor, descricao, conta_origem, conta_destino in lancamentos:
+            sinal = sinal_do_lancamento(conta, conta_origem, conta_destino)
+            saldo += sinal * valor
+            linhas.append((data, tipo, descrever(conta, tipo, descricao, conta_origem, conta_destino),
+                           sinal * valor, saldo))
+
+        if 'csv' in formatos:
+            with open(os.path.join(diretorio, f'{conta}.csv'), 'w', newline='', encoding='utf-8') as arquivo:
+                escritor = csv.writer(arquivo)
+                escritor.writerow(['Data', 'Tipo', 'Descrição', 'Valor', 'Saldo'])
+                escritor.writerow(['', 'SALDO_INICIAL', 'Saldo anterior', '', f'{saldo_inicial:.2f}'])
+                for data, tipo, descricao, valor, saldo_linha in linhas:
+                    escritor.writerow([data, tipo, descricao, f'{valor:.2f}', f'{saldo_linha:.2f}'])
+
+        if 'html' in formatos:
+            with open(os.path.join(diretorio, f'{conta}.html'), 'w', encoding='utf-8') as arquivo:
+                arquivo.write(_html_extrato(conta, titular, tipo_conta, competencia, saldo_inicial, saldo, linhas))
+
+    return len(lote), sum(len(item[4]) for item in lote)
+
+def _html_extrato(conta, titular, tipo_conta, competencia, saldo_inicial, saldo_final, linhas):
+    """Monta o extrato em HTML pronto para impressão/PDF"""
+    corpo = ''.join(
+        f"<tr><td>{html.escape(data or '')}</td><td>{html.escape(tipo)}</td>"
+        f"<td>{html.escape(descricao or '')}</td><td class='valor'>R$ {valor:,.2f}</td>"
+        f"<td class='valor'>R$ {saldo:,.2f}</td></tr>"
+        for data, tipo, descricao, valor, saldo in linhas
+    )
+    return f"""<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+<meta charset="utf-8">
+<title>Extrato {html.escape(conta)} - {competencia}</title>
+<style>
+    @page {{ size: A4; margin: 15mm; }}
+    body {{ font-family: sans-serif; color: #1E3A8A; }}
+    table {{ width: 100%; border-collapse: collapse; }}
+    th, td {{ border-bottom: 1px solid #ddd; padding: 4px; font-size: 12px; }}
+    .valor {{ text-align: right; }}
+</style>
+</head>
+<body>
+<h1>🏦 BankTech - Extrato {competencia}</h1>
+<p><strong>Conta:</strong> {html.escape(conta)} ({html.escape(tipo_conta or '')})<br>
+<strong>Titular:</strong> {html.escape(titular or '')}</p>
+<p><strong>Saldo anterior:</strong> R$ {saldo_inicial:,.2f}</p>
+<table>
+<tr><th>Data</th><th>Tipo</th><th>Descrição</th><th>Valor</th><th>Saldo</th></tr>
+{corpo}
+</table>
+<p><strong>Saldo final:</strong> R$ {saldo_final:,.2f}</p>
+</body>
+</html>
+"""
+
+def _movimento_posterior(conn, desde):
+    """Líquido (créditos - débitos) por conta a partir de um instante, em duas passadas agregadas"""
+    movimento = {}
+    for conta, total in conn.execute('''
+        SELECT conta_destino, SUM(valor) FROM transacoes
+        WHERE criado_em >= ? AND conta_destino IS NOT NULL GROUP BY conta_destino
+    ''', (desde,)):
+        movimento[conta] = movimento.get(conta, 0.0) + total
+    for conta, total in conn.execute('''
+        SELECT conta_origem, SUM(valor) FROM transacoes
+        WHERE criado_em >= ? AND conta_origem IS NOT NULL GROUP BY conta_origem
+    ''', (desde,)):
+        movimento[conta] = movimento.get(conta, 0.0) - total
+    return movimento
+
+def _contas_com_lancamentos(conn, inicio, fim, apos_conta):
+    """Percorre as contas em ordem com os lançamentos do mês, em uma única leitura do razão"""
+    contas = conn.execute('''
+        SELECT numero, titular, tipo_conta, saldo
+        FROM contas
+        WHERE numero > ?
+        ORDER BY numero
+    ''', (apos_conta,))
+
+    # Cada lançamento aparece uma vez para a origem e uma vez para o destino
+    # (uma só, se forem a mesma conta)
+    razao = conn.cursor().execute('''
+        SELECT conta_origem AS conta, id, data, tipo, valor, descricao, conta_origem, conta_destino
+        FROM transacoes
+        WHERE criado_em >= ? AND criado_em < ? AND conta_origem > ?
+        UNION ALL
+        SELECT conta_destino AS conta, id, data, tipo, valor, descricao, conta_origem, conta_destino
+        FROM transacoes
+        WHERE criado_em >= ? AND criado_em < ? AND conta_destino > ?
+          AND conta_destino IS NOT conta_origem
+        ORDER BY conta, id
+    ''', (inicio, fim, apos_conta, inicio, fim, apos_conta))
+    grupos = groupby(razao, key=lambda linha: linha[0])
+
+    grupo_atual = next(grupos, None)
+    for numero, titular, tipo_conta, saldo in contas:
+        # Lançamentos de contas que não estão neste arquivo (outro shard) são ignorados
+        while grupo_atual is not None and grupo_atual[0] < numero:
+            grupo_atual = next(grupos, None)
+
+        lancamentos = []
+        if grupo_atual is not None and grupo_atual[0] == numero:
+            lancamentos = [linha[2:] for linha in grupo_atual[1]]
+            grupo_atual = next(grupos, None)
+
+        yield numero, titular, tipo_conta, saldo, lancamentos
+
+def gerar_arquivo(caminho, competencia, diretorio, processos=1, formatos=('csv', 'html'),
+                  contas_por_lote=CONTAS_POR_LOTE):
+    """Gera os extratos das contas de um arquivo de banco.
+
+    O progresso (última conta de um lote já gravado, com todos os anteriores
+    também gravados) fica em um arquivo de controle no diretório de saída, e
+    uma nova execução continua a partir dele. No máximo 2 lotes por processo
+    ficam em memória ao mesmo tempo.
+    """
+    inicio_execucao = time.perf_counter()
+    inicio, fim = periodo_da_competencia(competencia)
+    os.makedirs(diretorio, exist_ok=True)
+
+    controle = os.path.join(diretorio, f'.progresso_{os.path.basename(caminho)}')
+    apos_conta = ''
+    if os.path.exists(controle):
+        with open(controle, encoding='utf-8') as arquivo:
+            apos_conta = arquivo.read().strip()
+
+    conn = conectar(caminho)
+    conn.execute('BEGIN')
+    movimento_posterior = _movimento_posterior(conn, fim)
+
+    def gravar_progresso(ultima_conta):
+        with open(controle, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(ultima_conta)
+
+    executor = None
+    if processos > 1:
+        executor = ProcessPoolExecutor(max_workers=processos, mp_context=multiprocessing.get_context('spawn'))
+
+    total_contas, total_lancamentos = 0, 0
+    pendentes = deque()
+    lote = []
+
+    def enviar(lote):
+        nonlocal total_contas, total_lancamentos
+        if executor is None:
+            contas, lancamentos = renderizar_lote(lote, diretorio, competencia, formatos)
+            total_contas += contas
+            total_lancamentos += lancamentos
+            gravar_progresso(lote[-1][0])
+            return
+
+        pendentes.append((executor.submit(renderizar_lote, lote, diretorio, competencia, formatos), lote[-1][0]))
+        while len(pendentes) >= processos * 2 or (pendentes and pendentes[0][0].done()):
+            futuro, ultima_conta = pendentes.popleft()
+            contas, lancamentos = futuro.result()
+            total_contas += contas
+            total_lancamentos += lancamentos
+            gravar_progresso(ultima_conta)
+
+    try:
+        for numero, titular, tipo_conta, saldo, lancamentos in _contas_com_lancamentos(conn, inicio, fim, apos_conta):
+            movimento_mes = sum(sinal_do_lancamento(numero, conta_origem, conta_destino) * valor
+                                for _, _, valor, _, conta_origem, conta_destino in lancamentos)
+            saldo_final = saldo - movimento_posterior.get(numero, 0.0)
+            lote.append((numero, titular, tipo_conta, saldo_final - movimento_mes, lancamentos))
+
+            if len(lote) >= contas_por_lote:
+                enviar(lote)
+                lote = []
+
+        if lote:
+            enviar(lote)
+
+        while pendentes:
+            futuro, ultima_conta = pendentes.popleft()
+            contas, lancamentos = futuro.result()
+            total_contas += contas
+            total_lancamentos += lancamentos
+            gravar_progresso(ultima_conta)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        conn.execute('COMMIT')
+        conn.close()
+
+    return total_contas, total_lancamentos, time.perf_counter() - inicio_execucao
+
+def gerar_extratos(competencia, diretorio='extratos', total_shards=0, processos=None, formatos=('csv', 'html')):
+    """Gera os extratos da competência para o banco principal ou todos os shards"""
+    processos = processos or os.cpu_count() or 1
+    destino = os.path.join(diretorio, competencia)
+    return [(caminho, *gerar_arquivo(caminho, competencia, destino, processos, formatos))
+            for caminho, _ in arquivos_do_banco(total_shards)]
+
+def main():
+    """Executa a geração pela linha de comando"""
+    parser = argparse.ArgumentParser(description="Extratos mensais de todas as contas")
+    parser.add_argument('--competencia', default=datetime.now().strftime('%Y-%m'),
+                        help="Mês de referência (AAAA-MM)")
+    parser.add_argument('--saida', default='extratos', help="Diretório de saída")
+    parser.add_argument('--formatos', default='csv,html', help="Formatos separados por vírgula (csv, html)")
+    parser.add_argument('--processos', type=int, help="Processos de renderização")
+    parser.add_argument('--shards', type=int, default=int(os.environ.get('BANKTECH_SHARDS', '0') or 0),
+                        help="Número de shards (modo fragmentado)")
+    args = parser.parse_args()
+
+    formatos = tuple(formato.strip() for formato in args.formatos.split(','))
+    for caminho, contas, lancamentos, duracao in gerar_extratos(
+            args.competencia, args.saida, args.shards, args.processos, formatos):
+        print(f"✅ {caminho}: {contas} extratos, {lancamentos} lançamentos em {duracao:.2f}s "
+              f"({contas / duracao if duracao else 0:,.0f} extratos/s)")
+
+if __name__ == "__main__":
+    main()
@@ -9,73 +9,42 @@ def init_database():
     
     # Conecta ao banco de dados
     conn = sqlite3.connect('database/banco_digital.db')
-    cursor = conn.cursor()
     
     print("🔄 Inicializando banco de dados...")
     
-    # Cria tabelas
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS contas (
-            numero TEXT PRIMARY KEY,
-            titular TEXT NOT NULL,
-            email TEXT,
-            cpf TEXT UNIQUE,
-            saldo REAL DEFAULT 0.0,
-            data_criacao TEXT,
-            tipo_conta TEXT DEFAULT 'CORRENTE'
-        )
-    ''')
+    # Cria tabelas aplicando as migrações pendentes
+    from migracoes import aplicar_migracoes, versao_schema
     
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS transacoes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            conta_origem TEXT,
-            conta_destino TEXT,
-            tipo TEXT NOT NULL,
-            valor REAL NOT NULL,
-            descricao TEXT,
-            data TEXT,
-            FOREIGN KEY (conta_origem) REFERENCES contas (numero),
-            FOREIGN KEY (conta_destino) REFERENCES contas (numero)
-        )
-    ''')
+    aplicadas = aplicar_migracoes(conn)
+    if aplicadas:
+        print(f"🧱 Migrações aplicadas: {', '.join(str(v) for v in aplicadas)}")
+    else:
+        print(f"🧱 Schema já atualizado (versão {versao_schema(conn)})")
     
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS usuarios (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            senha_hash TEXT NOT NULL,
-            nome TEXT NOT NULL,
-            cargo TEXT DEFAULT 'FUNCIONARIO'
-        )
-    ''')
-    
-    # Insere usuário admin padrão
-    import hashlib
-    senha_hash = hashlib.sha256('admin123'.encode()).hexdigest()
-    
-    cursor.execute('''
-        INSERT OR IGNORE INTO usuarios (username, senha_hash, nome, cargo)
-        VALUES (?, ?, ?, ?)
-    ''', ('admin', senha_hash, 'Administrador do Sistema', 'GERENTE'))
-    
-    # Insere algumas contas de exemplo
-    from datetime import datetime
+    conn.close()
     
+    # Insere algumas contas de exemplo com o depósito inicial no razão (e no outbox),
+    # como nas contas abertas pelo app, para que a conciliação feche desde o início.
+    # No modo fragmentado elas vão direto para os shards (e o registro de CPFs),
+    # em vez de serem recriadas no banco principal a cada inicialização
+    total_shards = int(os.environ.get('BANKTECH_SHARDS', '0') or 0)
+    if total_shards > 1:
+        from shards import BancoFragmentado
+        banco = BancoFragmentado(total_shards)
+    else:
+        from banco import BancoDigital
+        banco = BancoDigital()
     contas_exemplo = [
-        ('1001', 'João Silva', 'joao@email.com', '123.456.789-00', 1500.00, datetime.now().strftime("%d/%m/%Y %H:%M:%S"), 'CORRENTE'),
-        ('1002', 'Maria Santos', 'maria@email.com', '987.654.321-00', 2500.00, datetime.now().strftime("%d/%m/%Y %H:%M:%S"), 'POUPANÇA'),
-        ('1003', 'Pedro Oliveira', 'pedro@email.com', '456.123.789-00', 500.00, datetime.now().strftime("%d/%m/%Y %H:%M:%S"), 'CORRENTE'),
+        ('1001', 'João Silva', 'joao@email.com', '123.456.789-00', 1500.00, 'CORRENTE'),
+        ('1002', 'Maria Santos', 'maria@email.com', '987.654.321-00', 2500.00, 'POUPANÇA'),
+        ('1003', 'Pedro Oliveira', 'pedro@email.com', '456.123.789-00', 500.00, 'CORRENTE'),
     ]
     
     for conta in contas_exemplo:
-        cursor.execute('''
-            INSERT OR IGNORE INTO contas (numero, titular, email, cpf, saldo, data_criacao, tipo_conta)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', conta)
+        # Já existente: criar_conta recusa pelo número/CPF e nada é gravado
+        banco.criar_conta(*conta)
     
-    conn.commit()
-    conn.close()
+    banco.conn.close()
     
     print("✅ Banco de dados inicializado com sucesso!")
     print("📊 Contas de exemplo criadas:")
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Lote mensal de juros (POUPANÇA) e tarifas de manutenção (CORRENTE)
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+from armazenamento import arquivos_do_banco, conectar, transacao
+from migracoes import aplicar_migracoes
+from outbox import publicar_lancamentos
+
+# Taxas padrão por tipo de conta: juros mensais sobre o saldo e tarifa fixa de manutenção
+TAXAS_PADRAO = {
+    'CORRENTE': {'juros_mensal': 0.0, 'tarifa': 12.90},
+    'POUPANÇA': {'juros_mensal': 0.005, 'tarifa': 0.0},
+    'SALÁRIO': {'juros_mensal': 0.0, 'tarifa': 0.0},
+}
+
+TAMANHO_LOTE = 50000
+
+def carregar_taxas(caminho=None):
+    """Carrega a tabela de taxas de um JSON (mesmo formato de TAXAS_PADRAO)"""
+    if not caminho:
+        return TAXAS_PADRAO
+    with open(caminho, encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+def calcular_lancamentos(saldos, tipos, taxas):
+    """Calcula juros e tarifas de um bloco de contas de forma vetorizada.
+
+    Retorna dois arrays (juros, tarifas) arredondados em centavos. A tarifa
+    nunca deixa o saldo negativo: é limitada ao saldo disponível.
+    """
+    nomes, indices = np.unique(tipos, return_inverse=True)
+    juros_por_tipo = np.array([taxas.get(nome, {}).get('juros_mensal', 0.0) for nome in nomes])
+    tarifa_por_tipo = np.array([taxas.get(nome, {}).get('tarifa', 0.0) for nome in nomes])
+
+    positivos = np.maximum(saldos, 0.0)
+    juros = np.round(positivos * juros_por_tipo[indices], 2)
+    tarifas = np.round(np.minimum(tarifa_por_tipo[indices], positivos + juros), 2)
+    return juros, tarifas
+
+def processar_banco(conn, competencia, taxas=TAXAS_PADRAO, tamanho_lote=TAMANHO_LOTE):
+    """Aplica juros e tarifas da competência em um arquivo de banco.
+
+    As contas são lidas em blocos por rowid; cada bloco é lido, calculado e
+    gravado em uma única transação junto com o checkpoint em lotes_juros, então
+    uma execução interrompida recomeça do último bloco confirmado, uma
+    competência concluída não é aplicada duas vezes e duas execuções
+    simultâneas nunca processam o mesmo bloco.
+    """
+    processadas = 0
+    while True:
+        with transacao(conn):
+            # Checkpoint e saldos lidos sob o lock de escrita: outra execução ou
+            # um lançamento concorrente não podem alterá-los até o commit
+            conn.execute('INSERT OR IGNORE INTO lotes_juros (competencia) VALUES (?)', (competencia,))
+            ultimo_rowid, concluido = conn.execute(
+                'SELECT ultimo_rowid, concluido FROM lotes_juros WHERE competencia = ?', (competencia,)
+            ).fetchone()
+            if concluido:
+                break
+
+            linhas = conn.execute('''
+                SELECT rowid, numero, saldo, tipo_conta
+                FROM contas
+                WHERE rowid > ?
+                ORDER BY rowid
+                LIMIT ?
+            ''', (ultimo_rowid, tamanho_lote)).fetchall()
+
+            if not linhas:
+                conn.execute('UPDATE lotes_juros SET concluido = 1 WHERE competencia = ?', (competencia,))
+                break
+
+            rowids, numeros, saldos, tipos = zip(*linhas)
+            rowids = np.array(rowids, dtype=np.int64)
+            numeros = np.array(numeros, dtype=object)
+            saldos = np.array(saldos, dtype=float)
+            tipos = np.array([tipo or 'CORRENTE' for tipo in tipos])
+            juros, tarifas = calcular_lancamentos(saldos, tipos, taxas)
+            variacao = np.round(juros - tarifas, 2)
+
+            alteradas = variacao != 0
+            com_juros = juros > 0
+            com_tarifa = tarifas > 0
+            data = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+            criado_em = time.time()
+
+            # Com BEGIN IMMEDIATE ninguém mais lança até o commit: os ids acima deste são do bloco
+            ultimo_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM transacoes').fetchone()[0]
+            conn.executemany(
+                'UPDATE contas SET saldo = saldo + ? WHERE rowid = ?',
+                zip(variacao[alteradas].tolist(), rowids[alteradas].tolist())
+            )
+            lancamentos_juros = list(zip(numeros[com_juros].tolist(), juros[com_juros].tolist()))
+            lancamentos_tarifa = list(zip(numeros[com_tarifa].tolist(), tarifas[com_tarifa].tolist()))
+
+            descricao_juros = f"Juros {competencia}"
+            conn.executemany('''
+                INSERT INTO transacoes (conta_origem, conta_destino, tipo, valor, descricao, data, criado_em)
+                VALUES (NULL, ?, 'JUROS', ?, ?, ?, ?)
+            ''', ((numero, valor, descricao_juros, data, criado_em) for numero, valor in lancamentos_juros))
+            descricao_tarifa = f"Tarifa de manutenção {competencia}"
+            conn.executemany('''
+                INSERT INTO transacoes (conta_origem, conta_destino, tipo, valor, descricao, data, criado_em)
+                VALUES (?, NULL, 'TARIFA', ?, ?, ?, ?)
+            ''', ((numero, valor, descricao_tarifa, data, criado_em) for numero, valor in lancamentos_tarifa))
+
+            publicar_lancamentos(conn, ultimo_id)
+            conn.execute('''
+                UPDATE lotes_juros
+                SET ultimo_rowid = ?,
+                    contas_processadas = contas_processadas + ?,
+                    total_juros = total_juros + ?,
+                    total_tarifas = total_tarifas + ?,
+                    atualizado_em = ?
+                WHERE competencia = ?
+            ''', (int(rowids[-1]), len(linhas), float(juros.sum()), float(tarifas.sum()), data, competencia))
+
+        processadas += len(linhas)
+
+    return processadas
+
+def main():
+    """Executa o lote pela linha de comando"""
+    parser = argparse.ArgumentParser(description="Lote mensal de juros e tarifas")
+    parser.add_argument('--competencia', default=datetime.now().strftime('%Y-%m'),
+                        help="Mês de referência (AAAA-MM)")
+    parser.add_argument('--taxas', help="Arquivo JSON com as taxas por tipo de conta")
+    parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help="Contas por bloco")
+    parser.add_argument('--shards', type=int, default=int(os.environ.get('BANKTECH_SHARDS', '0') or 0),
+                        help="Número de shards (modo fragmentado)")
+    args = parser.parse_args()
+
+    taxas = carregar_taxas(args.taxas)
+    inicio = time.perf_counter()
+    total = 0
+
+    for caminho, migracoes in arquivos_do_banco(args.shards):
+        conn = conectar(caminho)
+        aplicar_migracoes(conn, migracoes)
+        total += processar_banco(conn, args.competencia, taxas, args.lote)
+        conn.close()
+
+    duracao = time.perf_counter() - inicio
+    print(f"✅ Competência {args.competencia}: {total} contas em {duracao:.2f}s "
+          f"({total / duracao if duracao else 0:,.0f} contas/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+import json
+import os
+import threading
+import time
+
+# Regras de velocidade por tipo de conta. Cada regra limita, dentro de uma janela
+# deslizante (em segundos), a quantidade de transferências e o valor total de saída
+# (saques + transferências). None desativa o respectivo limite.
+REGRAS_PADRAO = {
+    'CORRENTE': [
+        {'nome': 'hora', 'janela': 3600, 'max_transferencias': 10, 'max_saida': 20000.0},
+        {'nome': 'dia', 'janela': 86400, 'max_transferencias': 30, 'max_saida': 50000.0},
+    ],
+    'POUPANÇA': [
+        {'nome': 'hora', 'janela': 3600, 'max_transferencias': 5, 'max_saida': 10000.0},
+        {'nome': 'dia', 'janela': 86400, 'max_transferencias': 10, 'max_saida': 20000.0},
+    ],
+    'SALÁRIO': [
+        {'nome': 'dia', 'janela': 86400, 'max_transferencias': 5, 'max_saida': 10000.0},
+    ],
+}
+
+# Resolução das janelas: cada uma é dividida em NUM_BALDES intervalos de tempo
+NUM_BALDES = 12
+
+def carregar_regras():
+    """Carrega as regras do JSON indicado em BANKTECH_LIMITES (ou as padrão)"""
+    caminho = os.environ.get('BANKTECH_LIMITES')
+    if not caminho:
+        return REGRAS_PADRAO
+    with open(caminho, encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+class JanelaDeslizante:
+    """Contadores de uma janela deslizante em um anel de baldes de tempo"""
+
+    __slots__ = ('largura', 'contagens', 'valores', 'ultimo_balde', 'total_contagem', 'total_valor')
+
+    def __init__(self, janela, num_baldes=NUM_BALDES):
+        self.largura = janela / num_baldes
+        self.contagens = [0] * num_baldes
+        self.valores = [0.0] * num_baldes
+        self.ultimo_balde = None
+        self.total_contagem = 0
+        self.total_valor = 0.0
+
+    def _avancar(self, agora):
+        """Descarta os baldes que saíram da janela e retorna o balde atual"""
+        balde = int(agora // self.largura)
+        num_baldes = len(self.contagens)
+
+        if self.ultimo_balde is None or balde - self.ultimo_balde >= num_baldes:
+            self.contagens = [0] * num_baldes
+            self.valores = [0.0] * num_baldes
+            self.total_contagem = 0
+            self.total_valor = 0.0
+        else:
+            for expirado in range(self.ultimo_balde + 1, balde + 1):
+                indice = expirado % num_baldes
+                self.total_contagem -= self.contagens[indice]
+                self.total_valor -= self.valores[indice]
+                self.contagens[indice] = 0
+                self.valores[indice] = 0.0
+
+        if self.ultimo_balde is None or balde > self.ultimo_balde:
+            self.ultimo_balde = balde
+        return balde
+
+    def totais(self, agora):
+        """Retorna (contagem, valor) acumulados na janela"""
+        self._avancar(agora)
+        return self.total_contagem, self.total_valor
+
+    def adicionar(self, agora, contagem, valor):
+        """Acumula um evento no balde do instante informado"""
+        balde = self._avancar(agora)
+        if balde <= self.ultimo_balde - len(self.contagens):
+            return
+        indice = balde % len(self.contagens)
+        self.contagens[indice] += contagem
+        self.valores[indice] += valor
+        self.total_contagem += contagem
+        self.total_valor += valor
+
+    def remover(self, agora, contagem, valor):
+        """Retira um evento desfeito, do balde do instante informado para trás"""
+        self._avancar(agora)
+        num_baldes = len(self.contagens)
+        inicio = min(int(agora // self.largura), self.ultimo_balde)
+        for balde in range(inicio, self.ultimo_balde - num_baldes, -1):
+            if contagem <= 0 and valor <= 0:
+                break
+            indice = balde % num_baldes
+            retirada_contagem = min(contagem, self.contagens[indice])
+            retirada_valor = min(valor, self.valores[indice])
+            self.contagens[indice] -= retirada_contagem
+            self.valores[indice] -= retirada_valor
+            self.total_contagem -= retirada_contagem
+            self.total_valor -= retirada_valor
+            contagem -= retirada_contagem
+            valor -= retirada_valor
+
+    def vazia(self, agora):
+        """Indica se não há mais nada acumulado na janela"""
+        total_contagem, total_valor = self.totais(agora)
+        return total_contagem <= 0 and total_valor < 0.005
+
+class LimitesVelocidade:
+    """Limites de velocidade por conta mantidos em memória.
+
+    Cada conta com movimento recente tem uma JanelaDeslizante por regra do seu
+    tipo; a verificação olha apenas os totais já acumulados, sem consultar o
+    banco. Uma saída só é registrada depois de confirmada (verificar dentro da
+    transação, registrar após o commit) e contas sem movimento na janela são
+    descartadas. O estado é reconstruído a partir dos lançamentos recentes na
+    inicialização e vale para o processo atual.
+    """
+
+    def __init__(self, regras=None):
+        self.regras = regras or REGRAS_PADRAO
+        self.janelas = {}
+        self.lock = threading.Lock()
+        # Contas sem movimento na janela são descartadas a cada intervalo de um balde
+        menor_janela = min((regra['janela'] for regras in self.regras.values() for regra in regras), default=3600)
+        self.intervalo_limpeza = menor_janela / NUM_BALDES
+        self.proxima_limpeza = 0.0
+
+    def _janelas_da_conta(self, conta, tipo_conta):
+        janelas = self.janelas.get(conta)
+        if janelas is None:
+            janelas = [JanelaDeslizante(regra['janela']) for regra in self.regras.get(tipo_conta, [])]
+            self.janelas[conta] = janelas
+        return janelas
+
+    def _limpar(self, agora):
+        """Descarta as contas cujas janelas já não acumulam nada"""
+        self.proxima_limpeza = agora + self.intervalo_limpeza
+        for conta, janelas in list(self.janelas.items()):
+            if all(janela.vazia(agora) for janela in janelas):
+                del self.janelas[conta]
+
+    def verificar(self, conta, tipo_conta, valor, transferencia, agora=None):
+        """Verifica se uma saída cabe nos limites; retorna None ou o motivo da recusa.
+
+        Não altera as janelas: quem chama registra a saída depois do commit.
+        """
+        agora = time.time() if agora is None else agora
+
+        with self.lock:
+            janelas = self.janelas.get(conta)
+            if janelas is None:
+                totais = [(0, 0.0)] * len(self.regras.get(tipo_conta, []))
+            else:
+                totais = [janela.totais(agora) for janela in janelas]
+
+            for regra, (total_contagem, total_valor) in zip(self.regras.get(tipo_conta, []), totais):
+                maximo = regra.get('max_transferencias')
+                if transferencia and maximo is not None and total_contagem + 1 > maximo:
+                    return f"Limite de {maximo} transferências por {regra['nome']} excedido!"
+                maximo = regra.get('max_saida')
+                if maximo is not None and total_valor + valor > maximo:
+                    return f"Limite de saída de R$ {maximo:,.2f} por {regra['nome']} excedido!"
+        return None
+
+    def registrar(self, conta, tipo_conta, valor, transferencia, agora=None):
+        """Registra uma saída já confirmada no banco"""
+        agora = time.time() if agora is None else agora
+        with self.lock:
+            for janela in self._janelas_da_conta(conta, tipo_conta):
+                janela.adicionar(agora, 1 if transferencia else 0, valor)
+            if agora >= self.proxima_limpeza:
+                self._limpar(agora)
+
+    def desfazer(self, conta, valor, transferencia, agora=None):
+        """Retira uma saída estornada (transferência entre shards abortada)"""
+        agora = time.time() if agora is None else agora
+        with self.lock:
+            janelas = self.janelas.get(conta)
+            if janelas is None:
+                return
+            for janela in janelas:
+                janela.remover(agora, 1 if transferencia else 0, valor)
+            if all(janela.vazia(agora) for janela in janelas):
+                del self.janelas[conta]
+
+    def reconstruir(self, conn, agora=None):
+        """Carrega as saídas recentes de um banco (ou shard) nas janelas"""
+        agora = time.time() if agora is None else agora
+        maior_janela = max((regra['janela'] for regras in self.regras.values() for regra in regras), default=0)
+
+        linhas = conn.execute('''
+            SELECT t.conta_origem, c.tipo_conta, t.tipo, t.valor, t.criado_em
+            FROM transacoes t
+            JOIN contas c ON c.numero = t.conta_origem
+            WHERE t.criado_em >= ? AND t.tipo IN ('SAQUE', 'TRANSFERENCIA')
+            ORDER BY t.criado_em
+        ''', (agora - maior_janela,)).fetchall()
+
+        for conta, tipo_conta, tipo, valor, criado_em in linhas:
+            self.registrar(conta, tipo_conta, valor, tipo == 'TRANSFERENCIA', criado_em)
+
+        # Transferências entre shards abortadas devolvem o limite junto com o saldo
+        for conta, valor, criado_em in conn.execute('''
+            SELECT conta_destino, valor, criado_em
+            FROM transacoes
+            WHERE criado_em >= ? AND tipo = 'ESTORNO'
+        ''', (agora - maior_janela,)):
+            self.desfazer(conta, valor, True, criado_em)
+        return len(linhas)
+
+_instancias = {}
+_lock_instancias = threading.Lock()
+
+def limites_do_processo(chave, conexoes):
+    """Retorna os limites compartilhados do processo, reconstruindo na primeira chamada"""
+    with _lock_instancias:
+        limites = _instancias.get(chave)
+        if limites is None:
+            limites = LimitesVelocidade(carregar_regras())
+            for conn in conexoes:
+                limites.reconstruir(conn)
+            _instancias[chave] = limites
+        return limites
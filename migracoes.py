@@ -0,0 +1,270 @@
+import hashlib
+
+# Tabela compartilhada pelo banco principal e pelos shards
+CHECKPOINT_JUROS = '''
+    CREATE TABLE IF NOT EXISTS lotes_juros (
+        competencia TEXT PRIMARY KEY,
+        ultimo_rowid INTEGER NOT NULL DEFAULT 0,
+        contas_processadas INTEGER NOT NULL DEFAULT 0,
+        total_juros REAL NOT NULL DEFAULT 0.0,
+        total_tarifas REAL NOT NULL DEFAULT 0.0,
+        concluido INTEGER NOT NULL DEFAULT 0,
+        atualizado_em TEXT
+    )
+'''
+
+INDICE_CRIADO_EM = '''
+    CREATE INDEX IF NOT EXISTS idx_transacoes_criado_em ON transacoes (criado_em)
+'''
+
+RELATORIO_CONCILIACAO = [
+    '''
+    CREATE TABLE IF NOT EXISTS execucoes_conciliacao (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        data TEXT,
+        ultimo_id INTEGER,
+        contas INTEGER,
+        divergencias INTEGER,
+        duracao REAL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS divergencias_conciliacao (
+        execucao_id INTEGER NOT NULL,
+        conta TEXT NOT NULL,
+        saldo REAL,
+        saldo_razao REAL,
+        diferenca REAL,
+        FOREIGN KEY (execucao_id) REFERENCES execucoes_conciliacao (id)
+    )
+    ''',
+]
+
+def epoch_local(coluna):
+    """Expressão SQL que converte uma data 'DD/MM/AAAA HH:MM:SS' (hora local) em epoch"""
+    return (f"CAST(strftime('%s', substr({coluna}, 7, 4) || '-' || substr({coluna}, 4, 2) || '-' || "
+            f"substr({coluna}, 1, 2) || ' ' || substr({coluna}, 12, 8), 'utc') AS REAL)")
+
+# Contas com saldo e sem nenhum lançamento no razão (as de exemplo do init_db
+# antigo) ganham um lançamento de abertura com o saldo e o evento correspondente.
+# Contas com qualquer lançamento ficam como estão, para que divergências reais
+# continuem aparecendo na conciliação.
+SALDO_ABERTURA = [
+    f'''
+    INSERT INTO transacoes (conta_origem, conta_destino, tipo, valor, descricao, data, criado_em)
+    SELECT NULL, numero, 'DEPOSITO_INICIAL', saldo, 'Saldo anterior ao razão', data_criacao,
+           COALESCE({epoch_local('data_criacao')}, CAST(strftime('%s', 'now') AS REAL))
+    FROM contas
+    WHERE saldo > 0
+      AND numero NOT IN (
+          SELECT conta_origem FROM transacoes WHERE conta_origem IS NOT NULL
+          UNION
+          SELECT conta_destino FROM transacoes WHERE conta_destino IS NOT NULL
+      )
+    ''',
+    '''
+    INSERT INTO eventos_outbox (tipo, conta, dados, criado_em)
+    SELECT 'TRANSACAO', conta_destino,
+           json_object('id', id, 'conta_origem', NULL, 'conta_destino', conta_destino, 'tipo', tipo,
+                       'valor', valor, 'descricao', descricao, 'data', data),
+           criado_em
+    FROM transacoes
+    WHERE tipo = 'DEPOSITO_INICIAL' AND descricao = 'Saldo anterior ao razão'
+    ''',
+]
+
+OUTBOX = [
+    '''
+    CREATE TABLE IF NOT EXISTS eventos_outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        tipo TEXT NOT NULL,
+        conta TEXT,
+        dados TEXT NOT NULL,
+        criado_em REAL NOT NULL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS consumidores_outbox (
+        nome TEXT PRIMARY KEY,
+        ultimo_id INTEGER NOT NULL DEFAULT 0,
+        atualizado_em TEXT
+    )
+    ''',
+]
+
+# Registro de migrações do schema.
+# Cada entrada é (versão, descrição, lista de comandos SQL). A versão aplicada
+# fica gravada em PRAGMA user_version, então a verificação na inicialização
+# custa uma única leitura quando o banco já está atualizado.
+MIGRACOES = [
+    (1, "Schema inicial (contas, transações e usuários)", [
+        '''
+        CREATE TABLE IF NOT EXISTS contas (
+            numero TEXT PRIMARY KEY,
+            titular TEXT NOT NULL,
+            email TEXT,
+            cpf TEXT UNIQUE,
+            saldo REAL DEFAULT 0.0,
+            data_criacao TEXT,
+            tipo_conta TEXT DEFAULT 'CORRENTE'
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS transacoes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            conta_origem TEXT,
+            conta_destino TEXT,
+            tipo TEXT NOT NULL,
+            valor REAL NOT NULL,
+            descricao TEXT,
+            data TEXT,
+            FOREIGN KEY (conta_origem) REFERENCES contas (numero),
+            FOREIGN KEY (conta_destino) REFERENCES contas (numero)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS usuarios (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            senha_hash TEXT NOT NULL,
+            nome TEXT NOT NULL,
+            cargo TEXT DEFAULT 'FUNCIONARIO'
+        )
+        ''',
+        (
+            '''
+            INSERT OR IGNORE INTO usuarios (username, senha_hash, nome, cargo)
+            VALUES (?, ?, ?, ?)
+            ''',
+            ('admin', hashlib.sha256('admin123'.encode()).hexdigest(), 'Administrador', 'GERENTE')
+        ),
+    ]),
+    (2, "Registro do coordenador de transferências entre shards", [
+        '''
+        CREATE TABLE IF NOT EXISTS transferencias_2pc (
+            id TEXT PRIMARY KEY,
+            conta_origem TEXT NOT NULL,
+            conta_destino TEXT NOT NULL,
+            valor REAL NOT NULL,
+            estado TEXT NOT NULL DEFAULT 'INICIADA',
+            finalizada INTEGER NOT NULL DEFAULT 0,
+            criado_em REAL NOT NULL
+        )
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_transferencias_2pc_pendentes
+        ON transferencias_2pc (finalizada, criado_em)
+        ''',
+    ]),
+    (3, "Checkpoint do lote de juros e tarifas", [
+        CHECKPOINT_JUROS,
+    ]),
+    (4, "Instante (epoch) dos lançamentos para consultas por janela de tempo", [
+        'ALTER TABLE transacoes ADD COLUMN criado_em REAL',
+        INDICE_CRIADO_EM,
+    ]),
+    (5, "Relatório de conciliação razão x saldo", RELATORIO_CONCILIACAO),
+    (6, "Outbox transacional e deslocamento dos consumidores", OUTBOX),
+    (7, "Registro de CPFs do modo fragmentado (unicidade entre shards)", [
+        '''
+        CREATE TABLE IF NOT EXISTS cpfs (
+            cpf TEXT PRIMARY KEY,
+            conta TEXT NOT NULL,
+            criado_em REAL NOT NULL
+        )
+        ''',
+    ]),
+    (8, "Lançamento de abertura para saldos anteriores ao razão", SALDO_ABERTURA),
+    (9, "Instante dos lançamentos anteriores à coluna criado_em", [
+        f'UPDATE transacoes SET criado_em = {epoch_local("data")} WHERE criado_em IS NULL',
+    ]),
+]
+
+# Migrações de cada arquivo de shard (contas e lançamentos de um subconjunto de contas)
+MIGRACOES_SHARD = [
+    (1, "Schema inicial do shard", [
+        '''
+        CREATE TABLE IF NOT EXISTS contas (
+            numero TEXT PRIMARY KEY,
+            titular TEXT NOT NULL,
+            email TEXT,
+            cpf TEXT UNIQUE,
+            saldo REAL DEFAULT 0.0,
+            data_criacao TEXT,
+            tipo_conta TEXT DEFAULT 'CORRENTE'
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS transacoes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            conta_origem TEXT,
+            conta_destino TEXT,
+            tipo TEXT NOT NULL,
+            valor REAL NOT NULL,
+            descricao TEXT,
+            data TEXT,
+            criado_em REAL
+        )
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_transacoes_origem ON transacoes (conta_origem)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_transacoes_destino ON transacoes (conta_destino)
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS pendencias_2pc (
+            transferencia_id TEXT PRIMARY KEY,
+            conta TEXT NOT NULL,
+            papel TEXT NOT NULL,
+            valor REAL NOT NULL,
+            estado TEXT NOT NULL DEFAULT 'PREPARADA'
+        )
+        ''',
+    ]),
+    (2, "Checkpoint do lote de juros e tarifas", [
+        CHECKPOINT_JUROS,
+    ]),
+    (3, "Índice por instante dos lançamentos", [
+        INDICE_CRIADO_EM,
+    ]),
+    (4, "Relatório de conciliação razão x saldo", RELATORIO_CONCILIACAO),
+    (5, "Outbox transacional e deslocamento dos consumidores", OUTBOX),
+    (6, "Lançamento de abertura para saldos anteriores ao razão", SALDO_ABERTURA),
+]
+
+def versao_schema(conn):
+    """Retorna a versão do schema gravada no banco"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def aplicar_migracoes(conn, migracoes=MIGRACOES):
+    """Aplica as migrações pendentes e retorna a lista de versões aplicadas"""
+    versao = versao_schema(conn)
+    if versao >= migracoes[-1][0]:
+        return []
+
+    aplicadas = []
+    for numero, descricao, comandos in migracoes:
+        if numero <= versao:
+            continue
+
+        # Cada migração roda em uma transação própria junto com o user_version.
+        # BEGIN IMMEDIATE serializa os processos que iniciam juntos; a versão é
+        # relida com o lock, e quem chega depois só encontra a migração aplicada.
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            versao = versao_schema(conn)
+            if numero > versao:
+                for comando in comandos:
+                    if isinstance(comando, tuple):
+                        conn.execute(*comando)
+                    else:
+                        conn.execute(comando)
+                conn.execute(f'PRAGMA user_version = {int(numero)}')
+                aplicadas.append(numero)
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    return aplicadas
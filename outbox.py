@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Outbox transacional e feed de alterações para consumidores externos
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+from armazenamento import arquivos_do_banco, conectar, transacao
+from migracoes import aplicar_migracoes
+
+TAMANHO_LOTE = 500
+
+def publicar(conn, tipo, conta, dados):
+    """Grava um evento no outbox, dentro da transação já aberta por quem chama"""
+    conn.execute('''
+        INSERT INTO eventos_outbox (tipo, conta, dados, criado_em)
+        VALUES (?, ?, ?, ?)
+    ''', (tipo, conta, json.dumps(dados, ensure_ascii=False), time.time()))
+
+def publicar_lancamentos(conn, apos_id):
+    """Grava um evento TRANSACAO para cada lançamento com id acima de apos_id.
+
+    Os eventos são montados no próprio SQLite (json_object), na transação de
+    quem chama, com o mesmo conteúdo dos publicados por registrar_transacao.
+    """
+    conn.execute('''
+        INSERT INTO eventos_outbox (tipo, conta, dados, criado_em)
+        SELECT 'TRANSACAO', COALESCE(conta_origem, conta_destino),
+               json_object('id', id, 'conta_origem', conta_origem, 'conta_destino', conta_destino,
+                           'tipo', tipo, 'valor', valor, 'descricao', descricao, 'data', data),
+               criado_em
+        FROM transacoes
+        WHERE id > ?
+        ORDER BY id
+    ''', (apos_id,))
+
+class ConsumidorOutbox:
+    """Leitura incremental do outbox de um arquivo de banco.
+
+    O deslocamento (último evento confirmado) de cada consumidor fica na tabela
+    consumidores_outbox do próprio arquivo. A entrega é pelo menos uma vez:
+    quem consome confirma depois de processar o lote e deve tolerar eventos
+    repetidos após uma falha (o id do evento serve para deduplicar).
+    """
+
+    def __init__(self, nome, caminho='database/banco_digital.db', migracoes=None):
+        self.nome = nome
+        self.caminho = caminho
+        self.conn = conectar(caminho)
+        if migracoes:
+            aplicar_migracoes(self.conn, migracoes)
+        self.conn.execute('INSERT OR IGNORE INTO consumidores_outbox (nome) VALUES (?)', (nome,))
+
+    def deslocamento(self):
+        """Retorna o id do último evento confirmado"""
+        return self.conn.execute(
+            'SELECT ultimo_id FROM consumidores_outbox WHERE nome = ?', (self.nome,)
+        ).fetchone()[0]
+
+    def ler(self, limite=TAMANHO_LOTE):
+        """Retorna o próximo lote de eventos após o deslocamento confirmado"""
+        linhas = self.conn.execute('''
+            SELECT id, tipo, conta, dados, criado_em
+            FROM eventos_outbox
+            WHERE id > ?
+            ORDER BY id
+            LIMIT ?
+        ''', (self.deslocamento(), limite)).fetchall()
+
+        return [
+            {'id': id_evento, 'tipo': tipo, 'conta': conta, 'dados': json.loads(dados), 'criado_em': criado_em}
+            for id_evento, tipo, conta, dados, criado_em in linhas
+        ]
+
+    def confirmar(self, ultimo_id):
+        """Grava o progresso do consumidor (nunca retrocede)"""
+        with transacao(self.conn):
+            self.conn.execute('''
+                UPDATE consumidores_outbox
+                SET ultimo_id = MAX(ultimo_id, ?), atualizado_em = ?
+                WHERE nome = ?
+            ''', (ultimo_id, datetime.now().strftime("%d/%m/%Y %H:%M:%S"), self.nome))
+
+    def fechar(self):
+        self.conn.close()
+
+def consumidores(nome, total_shards=0):
+    """Cria um consumidor por arquivo: o banco principal e, se houver, cada shard"""
+    arquivos = arquivos_do_banco(0)
+    if total_shards > 1:
+        arquivos += arquivos_do_banco(total_shards)
+    return [ConsumidorOutbox(nome, caminho, migracoes) for caminho, migracoes in arquivos]
+
+def expurgar(conn):
+    """Remove eventos já confirmados por todos os consumidores"""
+    minimo = conn.execute('SELECT MIN(ultimo_id) FROM consumidores_outbox').fetchone()[0]
+    if not minimo:
+        return 0
+    with transacao(conn):
+        return conn.execute('DELETE FROM eventos_outbox WHERE id <= ?', (minimo,)).rowcount
+
+def main():
+    """Acompanha o feed pela linha de comando, emitindo um evento JSON por linha"""
+    parser = argparse.ArgumentParser(description="Feed de eventos do outbox")
+    parser.add_argument('--consumidor', help="Nome do consumidor (deslocamento próprio)")
+    parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help="Eventos por lote")
+    parser.add_argument('--seguir', action='store_true', help="Continua aguardando novos eventos")
+    parser.add_argument('--intervalo', type=float, default=1.0, help="Espera entre consultas (s)")
+    parser.add_argument('--shards', type=int, default=int(os.environ.get('BANKTECH_SHARDS', '0') or 0),
+                        help="Número de shards (modo fragmentado)")
+    parser.add_argument('--expurgar', action='store_true',
+                        help="Remove os eventos já confirmados por todos os consumidores e sai")
+    args = parser.parse_args()
+
+    if args.expurgar:
+        arquivos = arquivos_do_banco(0)
+        if args.shards > 1:
+            arquivos += arquivos_do_banco(args.shards)
+        for caminho, migracoes in arquivos:
+            conn = conectar(caminho)
+            aplicar_migracoes(conn, migracoes)
+            print(f"🧹 {caminho}: {expurgar(conn)} eventos removidos")
+            conn.close()
+        return
+    if not args.consumidor:
+        parser.error("informe --consumidor (ou --expurgar)")
+
+    leitores = consumidores(args.consumidor, args.shards)
+    while True:
+        lidos = 0
+        for leitor in leitores:
+            eventos = leitor.ler(args.lote)
+            for evento in eventos:
+                print(json.dumps({'arquivo': leitor.caminho, **evento}, ensure_ascii=False))
+            sys.stdout.flush()
+            if eventos:
+                leitor.confirmar(eventos[-1]['id'])
+            lidos += len(eventos)
+
+        if not args.seguir and lidos == 0:
+            break
+        if lidos == 0:
+            time.sleep(args.intervalo)
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,15 @@ Script de execução automática do Sistema Bancário
 """
 
 import os
+import re
 import sys
+import time
 import subprocess
 import platform
 
+# Instante do lançamento, usado pelo app para medir o tempo até a primeira página
+INICIO_LANCAMENTO = time.time()
+
 def check_python():
     """Verifica se Python está instalado"""
     try:
@@ -19,8 +24,43 @@ def check_python():
         print("📥 Baixe em: https://www.python.org/downloads/")
         return False
 
+def requirements_satisfied():
+    """Verifica se as dependências já estão instaladas nas versões exigidas"""
+    from importlib import metadata
+    
+    with open("requirements.txt", encoding="utf-8") as arquivo:
+        linhas = [linha.split("#")[0].strip() for linha in arquivo]
+    
+    for linha in linhas:
+        if not linha:
+            continue
+        
+        match = re.match(r"^([A-Za-z0-9_.\-]+)\s*(?:>=\s*([0-9.]+))?\s*$", linha)
+        if not match:
+            # Especificadores mais complexos ficam a cargo do pip
+            return False
+        
+        nome, versao_minima = match.groups()
+        try:
+            versao_instalada = metadata.version(nome)
+        except metadata.PackageNotFoundError:
+            return False
+        
+        if versao_minima and _versao(versao_instalada) < _versao(versao_minima):
+            return False
+    
+    return True
+
+def _versao(texto):
+    """Converte uma versão em tupla comparável"""
+    return tuple(int(parte) for parte in re.findall(r"\d+", texto)[:3])
+
 def install_requirements():
     """Instala as dependências necessárias"""
+    if requirements_satisfied():
+        print("\n📦 Dependências já instaladas")
+        return True
+    
     print("\n📦 Instalando dependências...")
     
     try:
@@ -35,7 +75,7 @@ def init_database():
     """Inicializa o banco de dados"""
     print("\n🗃️ Inicializando banco de dados...")
     try:
-        from database.init_database import init_database
+        from init_db import init_database
         init_database()
         return True
     except Exception as e:
@@ -52,8 +92,11 @@ def run_system():
     print("   🔒 Senha: admin123")
     print("\n⏸️  Para parar o sistema: Ctrl+C no terminal")
     
+    # O app registra o tempo até a primeira página em database/metricas_inicializacao.csv
+    env = dict(os.environ, BANKTECH_INICIO=str(INICIO_LANCAMENTO))
+    
     try:
-        subprocess.run([sys.executable, "-m", "streamlit", "run", "app.py"])
+        subprocess.run([sys.executable, "-m", "streamlit", "run", "app.py"], env=env)
     except KeyboardInterrupt:
         print("\n👋 Sistema encerrado!")
     except Exception as e:
@@ -0,0 +1,415 @@
+import argparse
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+
+from armazenamento import conectar, transacao
+from banco import BancoDigital
+from limites import limites_do_processo
+from migracoes import MIGRACOES_SHARD, aplicar_migracoes
+
+# Transferências entre shards sem decisão há mais tempo que isso são abortadas na recuperação
+TEMPO_RECUPERACAO = 60.0
+
+def shard_da_conta(numero, total_shards):
+    """Retorna o índice do shard de uma conta (hash estável do número)"""
+    return zlib.crc32(str(numero).encode()) % total_shards
+
+def mover_banco_principal(coordenador, shards):
+    """Move contas e lançamentos do banco principal para os shards (uma única vez).
+
+    Cada shard recebe suas contas e lançamentos em uma transação; contas que
+    já estão no shard são puladas (com seus lançamentos), então uma execução
+    interrompida pode ser repetida. Transferências entre contas de shards
+    diferentes ganham a perna TRANSFERENCIA_RECEBIDA no destino, como no commit
+    em duas fases. Só depois de todos os shards o banco principal é esvaziado.
+    Retorna o número de contas efetivamente movidas.
+    """
+    contas = coordenador.execute('''
+        SELECT numero, titular, email, cpf, saldo, data_criacao, tipo_conta FROM contas
+    ''').fetchall()
+    if not contas:
+        return 0
+
+    total_shards = len(shards)
+    movidas = 0
+    for indice, conn in enumerate(shards):
+        contas_do_shard = [conta for conta in contas if shard_da_conta(conta[0], total_shards) == indice]
+        if not contas_do_shard:
+            continue
+
+        with transacao(conn):
+            contas_do_shard = [
+                conta for conta in contas_do_shard
+                if not conn.execute('SELECT 1 FROM contas WHERE numero = ?', (conta[0],)).fetchone()
+            ]
+            if not contas_do_shard:
+                continue
+            novas = {conta[0] for conta in contas_do_shard}
+            conn.executemany('''
+                INSERT INTO contas (numero, titular, email, cpf, saldo, data_criacao, tipo_conta)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', contas_do_shard)
+
+            lancamentos = []
+            for origem, destino, tipo, valor, descricao, data, criado_em in coordenador.execute('''
+                SELECT conta_origem, conta_destino, tipo, valor, descricao, data, criado_em
+                FROM transacoes
+                ORDER BY id
+            '''):
+                if (origem or destino) in novas:
+                    lancamentos.append((origem, destino, tipo, valor, descricao, data, criado_em))
+                if origem and destino in novas and shard_da_conta(origem, total_shards) != indice:
+                    lancamentos.append((origem, destino, 'TRANSFERENCIA_RECEBIDA', valor,
+                                        f"Transferência recebida de {origem}", data, criado_em))
+            conn.executemany('''
+                INSERT INTO transacoes (conta_origem, conta_destino, tipo, valor, descricao, data, criado_em)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', lancamentos)
+        movidas += len(contas_do_shard)
+
+    with transacao(coordenador):
+        coordenador.executemany(
+            'INSERT OR IGNORE INTO cpfs (cpf, conta, criado_em) VALUES (?, ?, ?)',
+            ((conta[3], conta[0], time.time()) for conta in contas if conta[3])
+        )
+        coordenador.execute('DELETE FROM transacoes')
+        coordenador.execute('DELETE FROM contas')
+    return movidas
+
+class BancoFragmentado(BancoDigital):
+    """Banco com contas e lançamentos distribuídos em N arquivos SQLite.
+
+    Cada conta (e seus lançamentos) vive no shard dado pelo hash do número,
+    então operações em shards diferentes não disputam o mesmo lock de escrita.
+    Transferências entre shards usam commit em duas fases coordenado pela
+    tabela transferencias_2pc do banco principal. O número de shards deve
+    ser mantido fixo depois que houver dados. As operações de uma única conta
+    são as de BancoDigital; aqui só muda a conexão de cada conta e o caminho
+    entre shards.
+    """
+
+    def __init__(self, total_shards, diretorio='database/shards'):
+        self.total_shards = total_shards
+        self.diretorio = diretorio
+        super().__init__()
+
+    def init_database(self):
+        """Inicializa o banco principal (usuários e coordenador) e os shards"""
+        super().init_database()
+        self.coordenador = conectar('database/banco_digital.db')
+
+        os.makedirs(self.diretorio, exist_ok=True)
+        self.shards = []
+        for indice in range(self.total_shards):
+            conn = conectar(os.path.join(self.diretorio, f'banco_shard_{indice}.db'))
+            aplicar_migracoes(conn, MIGRACOES_SHARD)
+            self.shards.append(conn)
+
+        # Contas criadas antes do modo fragmentado (inclusive as de exemplo) vão para os shards
+        movidas = mover_banco_principal(self.coordenador, self.shards)
+        if movidas:
+            print(f"🔀 {movidas} contas do banco principal movidas para {self.total_shards} shards")
+        self._preencher_cpfs()
+
+        self.limites = limites_do_processo(self.diretorio, self.shards)
+        self.recuperar_transferencias()
+        self._agendar_recuperacao()
+
+    def _agendar_recuperacao(self):
+        """Agenda a próxima passada de recuperação.
+
+        Transferências INICIADA com menos de TEMPO_RECUPERACAO são puladas na
+        inicialização (podem estar em andamento em outro processo); como o app
+        inicializa o banco uma vez por processo, a recuperação se repete em
+        segundo plano para concluí-las depois desse prazo.
+        """
+        temporizador = threading.Timer(TEMPO_RECUPERACAO, self._recuperar_periodicamente)
+        temporizador.daemon = True
+        temporizador.start()
+
+    def _recuperar_periodicamente(self):
+        try:
+            self.recuperar_transferencias()
+        except sqlite3.Error as erro:
+            print(f"⚠️ Recuperação de transferências falhou: {erro}")
+        finally:
+            self._agendar_recuperacao()
+
+    def _preencher_cpfs(self):
+        """Carrega no registro de CPFs as contas de shards criadas antes dele"""
+        if self.coordenador.execute('SELECT 1 FROM cpfs LIMIT 1').fetchone():
+            return
+        agora = time.time()
+        with transacao(self.coordenador):
+            for conn in self.shards:
+                self.coordenador.executemany(
+                    'INSERT OR IGNORE INTO cpfs (cpf, conta, criado_em) VALUES (?, ?, ?)',
+                    ((cpf, numero, agora) for numero, cpf in
+                     conn.execute('SELECT numero, cpf FROM contas WHERE cpf IS NOT NULL'))
+                )
+
+    def _reservar_cpf(self, cpf, numero):
+        """Reserva o CPF no registro do coordenador; retorna False se já pertence a outra conta.
+
+        A chave primária de cpfs garante a unicidade entre shards e processos. Uma
+        reserva cuja conta não chegou a ser criada (processo interrompido) é
+        reaproveitada depois de TEMPO_RECUPERACAO.
+        """
+        try:
+            with transacao(self.coordenador):
+                self.coordenador.execute('INSERT INTO cpfs (cpf, conta, criado_em) VALUES (?, ?, ?)',
+                                         (cpf, numero, time.time()))
+            return True
+        except sqlite3.IntegrityError:
+            pass
+
+        conta, criado_em = self.coordenador.execute(
+            'SELECT conta, criado_em FROM cpfs WHERE cpf = ?', (cpf,)
+        ).fetchone()
+        if criado_em > time.time() - TEMPO_RECUPERACAO or self.consultar_saldo(conta)[0]:
+            return False
+        with transacao(self.coordenador):
+            cursor = self.coordenador.execute(
+                'UPDATE cpfs SET conta = ?, criado_em = ? WHERE cpf = ? AND conta = ? AND criado_em = ?',
+                (numero, time.time(), cpf, conta, criado_em)
+            )
+        return cursor.rowcount == 1
+
+    def _conn_da_conta(self, conta):
+        """Conexão do shard de uma conta"""
+        return self.shards[shard_da_conta(conta, self.total_shards)]
+
+    def criar_conta(self, numero, titular, email, cpf, saldo_inicial=0.0, tipo_conta='CORRENTE'):
+        """Cria uma nova conta bancária no shard correspondente"""
+        if cpf and not self._reservar_cpf(cpf, numero):
+            return False, "Erro: Número da conta ou CPF já existente!"
+
+        sucesso, mensagem = super().criar_conta(numero, titular, email, cpf, saldo_inicial, tipo_conta)
+        if not sucesso and cpf:
+            with transacao(self.coordenador):
+                self.coordenador.execute('DELETE FROM cpfs WHERE cpf = ? AND conta = ?', (cpf, numero))
+        return sucesso, mensagem
+
+    def transferir(self, conta_origem, conta_destino, valor):
+        """Realiza transferência entre contas (local ou entre shards)"""
+        conn_origem = self._conn_da_conta(conta_origem)
+        conn_destino = self._conn_da_conta(conta_destino)
+        if valor <= 0 or conn_origem is conn_destino:
+            return super().transferir(conta_origem, conta_destino, valor)
+        return self._transferir_entre_shards(conn_origem, conn_destino, conta_origem, conta_destino, valor)
+
+    def _transferir_entre_shards(self, conn_origem, conn_destino, conta_origem, conta_destino, valor):
+        """Transferência entre shards com commit em duas fases.
+
+        1. O coordenador registra a transferência como INICIADA.
+        2. Preparação: a origem debita o saldo e o destino registra o crédito pendente.
+        3. Decisão: o coordenador marca CONFIRMADA (ou ABORTADA) — ponto de commit.
+        4. Finalização: cada shard conclui ou desfaz sua pendência.
+        """
+        # Validação prévia evita abrir (e estornar) uma transferência fadada a falhar
+        if not self.consultar_saldo(conta_origem)[0]:
+            return False, "Conta de origem não encontrada!"
+        if not self.consultar_saldo(conta_destino)[0]:
+            return False, "Conta de destino não encontrada!"
+
+        transferencia_id = uuid.uuid4().hex
+        with transacao(self.coordenador):
+            self.coordenador.execute('''
+                INSERT INTO transferencias_2pc (id, conta_origem, conta_destino, valor, criado_em)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (transferencia_id, conta_origem, conta_destino, valor, time.time()))
+
+        erro = self._preparar_origem(conn_origem, transferencia_id, conta_origem, conta_destino, valor)
+        if erro is None:
+            erro = self._preparar_destino(conn_destino, transferencia_id, conta_destino, valor)
+
+        decisao = 'ABORTADA' if erro else 'CONFIRMADA'
+        with transacao(self.coordenador):
+            cursor = self.coordenador.execute(
+                "UPDATE transferencias_2pc SET estado = ? WHERE id = ? AND estado = 'INICIADA'",
+                (decisao, transferencia_id)
+            )
+        if cursor.rowcount == 0:
+            # A recuperação de outro processo já abortou esta transferência
+            decisao = 'ABORTADA'
+            erro = erro or "Transferência cancelada por tempo excedido!"
+
+        self._finalizar(transferencia_id, conta_origem, conta_destino, decisao)
+
+        if erro:
+            return False, erro
+        return True, f"Transferência de R$ {valor:.2f} realizada com sucesso!"
+
+    def _preparar_origem(self, conn, transferencia_id, conta_origem, conta_destino, valor):
+        """Fase 1 na origem: debita e registra a pendência"""
+        with conn.trava:
+            with transacao(conn):
+                resultado = conn.execute('SELECT saldo, tipo_conta FROM contas WHERE numero = ?', (conta_origem,)).fetchone()
+                if not resultado:
+                    return "Conta de origem não encontrada!"
+                if resultado[0] < valor:
+                    return "Saldo insuficiente para transferência!"
+
+                recusa = self.limites.verificar(conta_origem, resultado[1], valor, transferencia=True)
+                if recusa:
+                    return recusa
+
+                conn.execute('UPDATE contas SET saldo = saldo - ? WHERE numero = ?', (valor, conta_origem))
+                self.registrar_transacao(conta_origem, conta_destino, 'TRANSFERENCIA', valor,
+                                         f"Transferência para {conta_destino}")
+                conn.execute('''
+                    INSERT INTO pendencias_2pc (transferencia_id, conta, papel, valor)
+                    VALUES (?, ?, 'ORIGEM', ?)
+                ''', (transferencia_id, conta_origem, valor))
+            # O débito preparado conta no limite; se a transferência for abortada, _finalizar devolve
+            self.limites.registrar(conta_origem, resultado[1], valor, transferencia=True)
+        return None
+
+    def _preparar_destino(self, conn, transferencia_id, conta_destino, valor):
+        """Fase 1 no destino: valida a conta e registra o crédito pendente"""
+        with transacao(conn):
+            if not conn.execute('SELECT 1 FROM contas WHERE numero = ?', (conta_destino,)).fetchone():
+                return "Conta de destino não encontrada!"
+            conn.execute('''
+                INSERT INTO pendencias_2pc (transferencia_id, conta, papel, valor)
+                VALUES (?, ?, 'DESTINO', ?)
+            ''', (transferencia_id, conta_destino, valor))
+        return None
+
+    def _finalizar(self, transferencia_id, conta_origem, conta_destino, decisao):
+        """Fase 2: aplica a decisão nos dois shards (idempotente)"""
+        conn_origem = self._conn_da_conta(conta_origem)
+        with transacao(conn_origem):
+            pendencia = conn_origem.execute(
+                "SELECT valor FROM pendencias_2pc WHERE transferencia_id = ? AND estado = 'PREPARADA'",
+                (transferencia_id,)
+            ).fetchone()
+            if pendencia and decisao == 'ABORTADA':
+                conn_origem.execute('UPDATE contas SET saldo = saldo + ? WHERE numero = ?',
+                                    (pendencia[0], conta_origem))
+                self.registrar_transacao(None, conta_origem, 'ESTORNO', pendencia[0],
+                                         f"Estorno de transferência para {conta_destino}")
+            if pendencia:
+                conn_origem.execute(
+                    'UPDATE pendencias_2pc SET estado = ? WHERE transferencia_id = ?',
+                    ('CONCLUIDA' if decisao == 'CONFIRMADA' else 'DESFEITA', transferencia_id)
+                )
+        if pendencia and decisao == 'ABORTADA':
+            self.limites.desfazer(conta_origem, pendencia[0], True)
+
+        conn_destino = self._conn_da_conta(conta_destino)
+        with transacao(conn_destino):
+            pendencia = conn_destino.execute(
+                "SELECT valor FROM pendencias_2pc WHERE transferencia_id = ? AND estado = 'PREPARADA'",
+                (transferencia_id,)
+            ).fetchone()
+            if pendencia and decisao == 'CONFIRMADA':
+                conn_destino.execute('UPDATE contas SET saldo = saldo + ? WHERE numero = ?',
+                                     (pendencia[0], conta_destino))
+                self.registrar_transacao(conta_origem, conta_destino, 'TRANSFERENCIA_RECEBIDA',
+                                         pendencia[0], f"Transferência recebida de {conta_origem}")
+            if pendencia:
+                conn_destino.execute(
+                    'UPDATE pendencias_2pc SET estado = ? WHERE transferencia_id = ?',
+                    ('CONCLUIDA' if decisao == 'CONFIRMADA' else 'DESFEITA', transferencia_id)
+                )
+
+        with transacao(self.coordenador):
+            self.coordenador.execute('UPDATE transferencias_2pc SET finalizada = 1 WHERE id = ?',
+                                     (transferencia_id,))
+
+    def recuperar_transferencias(self):
+        """Conclui transferências entre shards interrompidas (executado na inicialização)"""
+        limite = time.time() - TEMPO_RECUPERACAO
+        pendentes = self.coordenador.execute('''
+            SELECT id, conta_origem, conta_destino, estado
+            FROM transferencias_2pc
+            WHERE finalizada = 0 AND (estado != 'INICIADA' OR criado_em < ?)
+        ''', (limite,)).fetchall()
+
+        for transferencia_id, conta_origem, conta_destino, estado in pendentes:
+            if estado == 'INICIADA':
+                # Sem decisão gravada: aborta (presumed abort)
+                with transacao(self.coordenador):
+                    self.coordenador.execute(
+                        "UPDATE transferencias_2pc SET estado = 'ABORTADA' WHERE id = ? AND estado = 'INICIADA'",
+                        (transferencia_id,)
+                    )
+                estado = self.coordenador.execute(
+                    'SELECT estado FROM transferencias_2pc WHERE id = ?', (transferencia_id,)
+                ).fetchone()[0]
+            self._finalizar(transferencia_id, conta_origem, conta_destino, estado)
+
+        return len(pendentes)
+
+    def obter_contas(self):
+        """Obtém todas as contas cadastradas em todos os shards"""
+        contas = []
+        for conn in self.shards:
+            contas.extend(conn.execute('''
+                SELECT numero, titular, email, cpf, saldo, data_criacao, tipo_conta
+                FROM contas
+            ''').fetchall())
+        contas.sort(key=lambda conta: conta[5] or '', reverse=True)
+        return contas
+
+    def obter_estatisticas(self):
+        """Obtém estatísticas do banco somando os shards"""
+        total_contas, saldo_total, total_transacoes = 0, 0.0, 0
+        for conn in self.shards:
+            contas, saldo = conn.execute('SELECT COUNT(*), SUM(saldo) FROM contas').fetchone()
+            # O crédito de uma transferência entre shards é a segunda perna da mesma transação
+            transacoes = conn.execute(
+                "SELECT COUNT(*) FROM transacoes WHERE tipo != 'TRANSFERENCIA_RECEBIDA'"
+            ).fetchone()[0]
+            total_contas += contas
+            saldo_total += saldo or 0
+            total_transacoes += transacoes
+
+        return total_contas, saldo_total, total_transacoes
+
+    def obter_todas_transacoes(self, limite=100):
+        """Obtém as últimas transações de todos os shards com o nome dos titulares"""
+        linhas = []
+        for conn in self.shards:
+            linhas.extend(conn.execute('''
+                SELECT criado_em, data, tipo, valor, descricao, conta_origem, conta_destino
+                FROM transacoes
+                WHERE tipo != 'TRANSFERENCIA_RECEBIDA'
+                ORDER BY id DESC
+                LIMIT ?
+            ''', (limite,)).fetchall())
+        linhas.sort(key=lambda linha: linha[0] or 0, reverse=True)
+        linhas = linhas[:limite]
+
+        titulares = {}
+        for linha in linhas:
+            for conta in linha[5:7]:
+                if conta and conta not in titulares:
+                    titulares[conta] = self.consultar_saldo(conta)[2] or None
+
+        return [
+            (data, tipo, valor, descricao, titulares.get(origem), titulares.get(destino))
+            for _, data, tipo, valor, descricao, origem, destino in linhas
+        ]
+
+def main():
+    """Move as contas do banco principal para os shards pela linha de comando"""
+    parser = argparse.ArgumentParser(description="Migração do banco principal para o modo fragmentado")
+    parser.add_argument('--shards', type=int, default=int(os.environ.get('BANKTECH_SHARDS', '0') or 0),
+                        help="Número de shards (modo fragmentado)")
+    args = parser.parse_args()
+    if args.shards < 2:
+        parser.error("informe --shards N (N > 1) ou BANKTECH_SHARDS")
+
+    # A inicialização do banco fragmentado já faz a movimentação pendente
+    banco = BancoFragmentado(args.shards)
+    total_contas = banco.obter_estatisticas()[0]
+    print(f"✅ {total_contas} contas em {args.shards} shards")
+
+if __name__ == "__main__":
+    main()